@@ -0,0 +1,14 @@
+# array_utils.py
+import numpy as np
+
+
+def scatter_add(target: np.ndarray, index: np.ndarray, values: np.ndarray):
+    """
+    target[index[k]] += values[k] for an (N, 2) target, accumulating repeated
+    indices. np.bincount is considerably faster than np.add.at for this.
+    """
+    if len(index) == 0:
+        return
+    n = len(target)
+    target[:, 0] += np.bincount(index, weights=values[:, 0], minlength=n)
+    target[:, 1] += np.bincount(index, weights=values[:, 1], minlength=n)
@@ -0,0 +1,70 @@
+# backends.py
+"""
+The engines by backend name, for choosing one when the simulation is built:
+
+    object      physics.PhysicsEngine, loops over the Particle/Spring objects, easiest to debug
+    vectorized  vectorized_physics.VectorizedPhysicsEngine, whole-array NumPy operations
+    jit         jit_physics.JitPhysicsEngine, the NumPy engine with its hot loops compiled by numba
+    parallel    parallel_physics.ParallelPhysicsEngine, the NumPy engine split over worker processes
+
+All take the arguments of PhysicsEngine and give the same results up to
+rounding, with these exceptions:
+
+    parallel    takes workers= and halo_skin= as well; raises ValueError for
+                solver="xpbd" and respa_substeps != 1; only writes the
+                positions back to the Particle objects on sync(); profiles
+                its step as the phases "forces" and "integrate", since the
+                workers run all phases together
+"""
+import importlib
+import warnings
+
+BACKENDS = {
+    "object": ("physics", "PhysicsEngine"),
+    "vectorized": ("vectorized_physics", "VectorizedPhysicsEngine"),
+    "jit": ("jit_physics", "JitPhysicsEngine"),
+    "parallel": ("parallel_physics", "ParallelPhysicsEngine"),
+}
+
+# what to use instead when a backend's dependencies are not installed
+FALLBACK = {"jit": "vectorized", "parallel": "vectorized", "vectorized": "object"}
+
+
+def engine_class(backend: str) -> type:
+    """The engine class of backend, raises ImportError if it needs a package that is missing."""
+    module, name = BACKENDS[backend]
+    return getattr(importlib.import_module(module), name)
+
+
+def available_engines() -> dict:
+    """Backend name -> engine class of every backend that can be used here."""
+    engines = {}
+    for backend in BACKENDS:
+        try:
+            engines[backend] = engine_class(backend)
+        except ImportError:
+            pass
+    return engines
+
+
+def create_engine(particles, springs, bending_springs=None, backend: str = "vectorized", fallback: bool = True,
+                  **params):
+    """
+    Build the engine of backend over the given objects, params are the engine
+    keyword arguments. If the backend is not available, the next one in
+    FALLBACK is used with a warning, or with fallback=False the ImportError
+    is raised.
+    """
+    requested = backend
+    while True:
+        try:
+            cls = engine_class(backend)
+            break
+        except ImportError as e:
+            if not fallback or backend not in FALLBACK:
+                raise
+            error = e
+            backend = FALLBACK[backend]
+    if backend != requested:
+        warnings.warn(f"backend {requested!r} is not available ({error}), using {backend!r}")
+    return cls(particles, springs, bending_springs, **params)
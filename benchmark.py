@@ -0,0 +1,173 @@
+# benchmark.py
+"""
+Benchmark PhysicsEngine.update on the scenes of the start scripts and on
+synthetic scenes of growing size. Reports per-step wall time, steps/second,
+and per phase the time per step and the peak memory it allocates, as the
+engine's own profiling (PhysicsEngine.enable_profiling) records them, so the
+phases are those the engine really runs (workers, RESPA substeps, adaptive
+steps). The memory of ParallelPhysicsEngine is that of the main process
+only, its workers are not traced. Results are written as JSON so runs of
+different commits can be compared.
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+from headless import ENGINES
+from scenes import SCENES, synthetic_scene
+
+DEFAULT_SIZES = (100, 500, 1000, 5000, 20000)
+
+
+def scene_cases(sizes):
+    """(name, builder) of every scene to benchmark."""
+    cases = list(SCENES.items())
+    for n in sizes:
+        cases.append((f"synthetic_{n}", lambda n=n: synthetic_scene(n)))
+    return cases
+
+
+def benchmark_engine(physics, steps: int, dt: float, warmup: int = 2, memory_steps: int = 2):
+    """Time steps updates, then steps profiled updates for the phases, then memory_steps for their memory."""
+    for _ in range(warmup):
+        physics.update(dt)
+
+    step_times = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        physics.update(dt)
+        step_times.append(time.perf_counter() - start)
+
+    # a separate pass, the timers of the profiling add a little to every step
+    stats = physics.enable_profiling()
+    stats.reset()
+    for _ in range(steps):
+        physics.update(dt)
+    physics.disable_profiling()
+
+    # memory separately, tracemalloc slows everything down considerably
+    memory = physics.enable_profiling(memory=True)
+    for _ in range(memory_steps):
+        physics.update(dt)
+    physics.disable_profiling()
+
+    mean = statistics.fmean(step_times)
+    return {
+        "steps": steps,
+        "step_time_mean": mean,
+        "step_time_median": statistics.median(step_times),
+        "step_time_min": min(step_times),
+        "steps_per_second": 1 / mean if mean > 0 else float("inf"),
+        # physics steps behind the phase times, more than steps with adaptive_dt
+        "profiled_steps": stats.steps,
+        # what the peaks cover: worker processes are not traced
+        "memory_scope": "main process" if hasattr(physics, "workers") else "all",
+        "phases": {name: {"time_per_step": stats.mean(name), "peak_bytes": memory.peak[name]}
+                   for name in stats.phase_names},
+    }
+
+
+def run(sizes=DEFAULT_SIZES, engines=tuple(ENGINES), steps: int = 20, dt: float = 1 / 120, verbose=True):
+    results = []
+    for scene, builder in scene_cases(sizes):
+        for engine in engines:
+            particles, springs, bending_springs, params = builder()
+            physics = ENGINES[engine](particles, springs, bending_springs, **params)
+            result = {
+                "scene": scene,
+                "engine": engine,
+                "particles": len(particles),
+                "springs": len(springs),
+                "bending_springs": len(bending_springs),
+            }
+            result.update(benchmark_engine(physics, steps, dt))
+            if hasattr(physics, "close"):
+                physics.close()
+            results.append(result)
+            if verbose:
+                print_result(result)
+    return {"meta": metadata(steps, dt), "results": results}
+
+
+def metadata(steps, dt):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": numpy_version,
+        "machine": platform.machine(),
+        "steps": steps,
+        "dt": dt,
+    }
+
+
+def print_result(result):
+    phases = "  ".join(f"{name} {phase['time_per_step'] * 1e3:.2f}ms/{phase['peak_bytes'] / 1024:.0f}KiB"
+                       for name, phase in result["phases"].items())
+    scope = " (main process)" if result["memory_scope"] == "main process" else ""
+    print(f"{result['scene']:>16} {result['engine']:>10} {result['particles']:>6} particles: "
+          f"{result['step_time_mean'] * 1e3:8.2f} ms/step {result['steps_per_second']:8.1f} steps/s "
+          f"| time/peak per phase{scope}: {phases}")
+
+
+def compare(new, old, threshold: float = 0.1):
+    """Print the step-time ratio new/old per scene and engine. Returns the cases slower by more than threshold."""
+    before = {(r["scene"], r["engine"]): r for r in old["results"]}
+    regressions = []
+    print(f"compared with {old['meta'].get('commit')} ({old['meta'].get('timestamp')}):")
+    for r in new["results"]:
+        key = (r["scene"], r["engine"])
+        if key not in before:
+            continue
+        ratio = r["step_time_mean"] / before[key]["step_time_mean"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <-- slower"
+            regressions.append(key)
+        print(f"{key[0]:>16} {key[1]:>10}: {ratio:6.2f}x step time{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(DEFAULT_SIZES),
+                        help="particle counts of the synthetic scenes")
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=list(ENGINES))
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--dt", type=float, default=1 / 120)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slow-down reported as a regression")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.engines, args.steps, args.dt)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if compare(report, old, args.threshold):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# bending_set.py
+import numpy as np
+from bending_spring import BendingSpring
+from array_utils import scatter_add
+
+
+class BendingSet:
+    """
+    Array form of a list of BendingSprings: (p1, p2, p3) index triples, rest
+    angles and stiffnesses. The angles and torque forces of all triples are
+    computed in one vectorized pass with the same formulas as
+    BendingSpring.apply_unsigned / apply_signed.
+
+    Signed springs are stored after the unsigned ones, so each block runs its
+    own angle formula on a slice and no per-spring branch is needed.
+    """
+    def __init__(self, bending_springs: list[BendingSpring], index: dict):
+        """index maps id(particle) to the particle's row in the position array."""
+        bending_springs = bending_springs or []
+        ordered = ([bs for bs in bending_springs if not bs.signed]
+                   + [bs for bs in bending_springs if bs.signed])
+        self.bending_springs = ordered
+        self.n_unsigned = len(ordered) - sum(1 for bs in ordered if bs.signed)
+        self.p1 = np.array([index[id(bs.p1)] for bs in ordered], dtype=np.int64)
+        self.p2 = np.array([index[id(bs.p2)] for bs in ordered], dtype=np.int64)
+        self.p3 = np.array([index[id(bs.p3)] for bs in ordered], dtype=np.int64)
+        self.refresh()
+
+    @classmethod
+    def from_arrays(cls, p1, p2, p3, n_unsigned, rest_angle, stiffness):
+        """A BendingSet over plain arrays (unsigned triples first), without BendingSpring objects."""
+        bs = cls.__new__(cls)
+        bs.bending_springs = None
+        bs.p1, bs.p2, bs.p3 = p1, p2, p3
+        bs.n_unsigned = n_unsigned
+        bs.rest_angle, bs.stiffness = rest_angle, stiffness
+        return bs
+
+    def __len__(self):
+        return len(self.p1)
+
+    def refresh(self):
+        """Re-read rest angles and stiffnesses from the BendingSpring objects."""
+        self.rest_angle = np.array([bs.rest_angle for bs in self.bending_springs], dtype=float)
+        self.stiffness = np.array([bs.stiffness for bs in self.bending_springs], dtype=float)
+
+    def angles(self, pos: np.ndarray, wrap=None):
+        """
+        Current angle of every triple plus the edge vectors and lengths used for it.
+        wrap maps the edge vectors, see Boundary.wrap.
+        """
+        v1 = pos[self.p1] - pos[self.p2]
+        v2 = pos[self.p3] - pos[self.p2]
+        if wrap is not None:
+            v1, v2 = wrap(v1), wrap(v2)
+        L1 = np.hypot(v1[:, 0], v1[:, 1])
+        L2 = np.hypot(v2[:, 0], v2[:, 1])
+        dot = v1[:, 0] * v2[:, 0] + v1[:, 1] * v2[:, 1]
+        theta = np.empty(len(dot))
+        nu = self.n_unsigned
+        with np.errstate(divide="ignore", invalid="ignore"):
+            theta[:nu] = np.arccos(np.clip(dot[:nu] / (L1[:nu] * L2[:nu]), -1.0, 1.0))
+        cross = v1[nu:, 0] * v2[nu:, 1] - v1[nu:, 1] * v2[nu:, 0]
+        theta[nu:] = np.arctan2(cross, dot[nu:])
+        return theta, v1, v2, L1, L2
+
+    def apply(self, pos: np.ndarray, force: np.ndarray, wrap=None):
+        """Accumulate the bending forces for positions pos into the (N, 2) array force."""
+        if len(self) == 0:
+            return
+        theta, v1, v2, L1, L2 = self.angles(pos, wrap)
+        nu = self.n_unsigned
+        d_theta = theta - self.rest_angle
+        # signed deviations are wrapped so the short way round is taken
+        d_theta[nu:] = (d_theta[nu:] + np.pi) % (2 * np.pi) - np.pi
+        active = (np.abs(d_theta) >= 1e-6) & (L1 > 0) & (L2 > 0)
+
+        torque = -self.stiffness * np.where(active, d_theta, 0.0)
+        torque[nu:] = -torque[nu:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            u1 = np.where(active[:, None], v1 / L1[:, None], 0.0)
+            u2 = np.where(active[:, None], v2 / L2[:, None], 0.0)
+        # perpendicular directions n1 = (-u1.y, u1.x), n2 = (u2.y, -u2.x)
+        f1 = np.column_stack((-u1[:, 1], u1[:, 0])) * torque[:, None]
+        f3 = np.column_stack((u2[:, 1], -u2[:, 0])) * torque[:, None]
+        # equal and opposite at the vertex to conserve momentum
+        f2 = -(f1 + f3)
+
+        scatter_add(force, self.p1, f1)
+        scatter_add(force, self.p3, f3)
+        scatter_add(force, self.p2, f2)
@@ -2,29 +2,52 @@
 
 # bending_spring.py
 import math
-import pygame
+from vector import Vec2
 from particle import Particle
 
 class BendingSpring:
     """
     Applies a restoring torque to maintain the angle between three particles:
     p1 - p2 - p3 (p2 is the vertex).
+    With signed=True the angle is measured from p1 to p3 in (-pi, pi], so a
+    vertex that folds over to the other side is pushed back instead of being
+    treated like its mirror image.
     """
     def __init__(self, p1: Particle, p2: Particle, p3: Particle,
-                 rest_angle: float, stiffness: float):
+                 rest_angle: float, stiffness: float, signed: bool = False):
         self.p1 = p1
         self.p2 = p2
         self.p3 = p3
         self.rest_angle = rest_angle  # in radians
         self.stiffness = stiffness
+        self.signed = signed
 
-    # simple implementation
-    def apply(self):
-        # vectors from center p2
+    def apply(self, wrap=None):
+        """wrap maps separations (dx, dy) to the ones to use, see Boundary.wrap_xy."""
+        if self.signed:
+            self.apply_signed(wrap)
+        else:
+            self.apply_unsigned(wrap)
+
+    def edges(self, wrap=None):
+        """Vectors from the vertex p2 to p1 and to p3."""
         v1 = self.p1.pos - self.p2.pos
         v2 = self.p3.pos - self.p2.pos
+        if wrap is not None:
+            v1 = Vec2(*wrap(v1.x, v1.y))
+            v2 = Vec2(*wrap(v2.x, v2.y))
+        return v1, v2
+
+    # simple implementation
+    def apply_unsigned(self, wrap=None):
+        # vectors from center p2
+        v1, v2 = self.edges(wrap)
+        L1, L2 = v1.length(), v2.length()
+        # a collapsed edge has no direction, same as BendingSet
+        if L1 == 0 or L2 == 0:
+            return
         # current angle between v1 and v2
-        dot = max(-1.0, min(1.0, v1.dot(v2) / (v1.length() * v2.length())))
+        dot = max(-1.0, min(1.0, v1.dot(v2) / (L1 * L2)))
         theta = math.acos(dot)
         # angle deviation
         d_theta = theta - self.rest_angle
@@ -36,11 +59,11 @@ class BendingSpring:
 
         # normals for v1 and v2
         # get unit vectors
-        u1 = v1.normalize()
-        u2 = v2.normalize()
+        u1 = v1 / L1
+        u2 = v2 / L2
         # perpendicular directions
-        n1 = pygame.Vector2(-u1.y, u1.x)
-        n2 = pygame.Vector2(u2.y, -u2.x)
+        n1 = Vec2(-u1.y, u1.x)
+        n2 = Vec2(u2.y, -u2.x)
 
         # forces applied at p1 and p3
         f1 = n1 * torque
@@ -52,33 +75,32 @@ class BendingSpring:
         self.p3.apply_force(f3)
         self.p2.apply_force(f2)
 
-    # def apply(self):
-    #     v1 = self.p1.pos - self.p2.pos
-    #     v2 = self.p3.pos - self.p2.pos
-    #     L1, L2 = v1.length(), v2.length()
-    #     if L1 == 0 or L2 == 0:
-    #         return
-    #
-    #     # signed angle between v1 and v2
-    #     cross_z = v1.x*v2.y - v1.y*v2.x
-    #     dot     = max(-1.0, min(1.0, v1.dot(v2)/(L1*L2)))
-    #     signed_theta = math.atan2(cross_z, dot)
-    #
-    #     # deviation from rest
-    #     d_theta = signed_theta - self.rest_angle
-    #     if abs(d_theta) < 1e-6:
-    #         return
-    #
-    #     # torque → forces
-    #     torque = -self.stiffness * d_theta
-    #     u1, u2 = v1 / L1, v2 / L2
-    #     # perpendicular normals
-    #     n1 = pygame.Vector2(-u1.y, u1.x)
-    #     n2 = pygame.Vector2(u2.y, -u2.x)
-    #     f1 = n1 * torque
-    #     f3 = n2 * torque
-    #     f2 = -(f1 + f3)
-    #
-    #     self.p1.apply_force(f1)
-    #     self.p3.apply_force(f3)
-    #     self.p2.apply_force(f2)
\ No newline at end of file
+    def apply_signed(self, wrap=None):
+        v1, v2 = self.edges(wrap)
+        L1, L2 = v1.length(), v2.length()
+        if L1 == 0 or L2 == 0:
+            return
+
+        # signed angle between v1 and v2
+        cross_z = v1.x*v2.y - v1.y*v2.x
+        signed_theta = math.atan2(cross_z, v1.dot(v2))
+
+        # deviation from rest, wrapped so the short way round is taken
+        d_theta = (signed_theta - self.rest_angle + math.pi) % (2 * math.pi) - math.pi
+        if abs(d_theta) < 1e-6:
+            return
+
+        # torque → forces; the signed angle shrinks when p1 moves along n1
+        # (and p3 along n2), hence the opposite sign to apply_unsigned
+        torque = self.stiffness * d_theta
+        u1, u2 = v1 / L1, v2 / L2
+        # perpendicular normals
+        n1 = Vec2(-u1.y, u1.x)
+        n2 = Vec2(u2.y, -u2.x)
+        f1 = n1 * torque
+        f3 = n2 * torque
+        f2 = -(f1 + f3)
+
+        self.p1.apply_force(f1)
+        self.p3.apply_force(f3)
+        self.p2.apply_force(f2)
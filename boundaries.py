@@ -0,0 +1,129 @@
+# boundaries.py
+"""
+Boundary conditions of the box [0, W] x [0, H], applied by the engine after
+every step (PhysicsEngine(..., boundary=...)). Each works on Particle objects
+for PhysicsEngine and on (N, 2) position arrays for VectorizedPhysicsEngine;
+the array methods only use array operators, so this module does not need numpy.
+"""
+
+
+class Boundary:
+    """No boundary, the domain is open. Base class of the boundaries below."""
+    # periodic boundaries also change how separations are measured, see wrap_xy
+    periodic = False
+
+    def apply(self, particles):
+        """Bring particles back into the box."""
+
+    def apply_arrays(self, pos, prev_pos):
+        """Same as apply on the position arrays, in place."""
+
+    def wrap_xy(self, dx, dy):
+        """Separation (dx, dy) between two particles as the forces see it."""
+        return dx, dy
+
+    def wrap(self, delta):
+        """wrap_xy for an (N, 2) array of separations."""
+        return delta
+
+    def to_dict(self) -> dict:
+        return {"type": "none"}
+
+
+class Clamp(Boundary):
+    """
+    Walls at the edges of the box. Particles that crossed one are put back on
+    it and stopped. With bouncy=True they are put back on it with prev_pos
+    set to pos - v, v being the displacement of the last step, as the
+    bouncy clamp of the apps always did.
+    """
+    def __init__(self, size, bouncy: bool = False):
+        self.size = (float(size[0]), float(size[1]))
+        self.bouncy = bouncy
+
+    def apply(self, particles):
+        W, H = self.size
+        if self.bouncy:
+            for p in particles:
+                if p.pos.x < 0 or p.pos.x > W:
+                    vx = p.pos.x - p.prev_pos.x
+                    p.pos.x = max(0, min(p.pos.x, W))
+                    p.prev_pos.x = p.pos.x - vx
+                if p.pos.y < 0 or p.pos.y > H:
+                    vy = p.pos.y - p.prev_pos.y
+                    p.pos.y = max(0, min(p.pos.y, H))
+                    p.prev_pos.y = p.pos.y - vy
+        else:
+            for p in particles:
+                if p.pos.x < 0 or p.pos.x > W:
+                    p.pos.x = p.prev_pos.x = max(0, min(p.pos.x, W))
+                if p.pos.y < 0 or p.pos.y > H:
+                    p.pos.y = p.prev_pos.y = max(0, min(p.pos.y, H))
+
+    def apply_arrays(self, pos, prev_pos):
+        for axis, limit in enumerate(self.size):
+            x = pos[:, axis]
+            out = (x < 0) | (x > limit)
+            if not out.any():
+                continue
+            clamped = x[out].clip(0, limit)
+            if self.bouncy:
+                # prev = clamped - (x - prev), as in apply
+                prev_pos[out, axis] = clamped - (x[out] - prev_pos[out, axis])
+            else:
+                prev_pos[out, axis] = clamped
+            x[out] = clamped
+
+    def to_dict(self) -> dict:
+        return {"type": "clamp", "size": list(self.size), "bouncy": self.bouncy}
+
+
+class Periodic(Boundary):
+    """
+    Periodic box: a particle leaving on one side comes back on the other, and
+    springs and repulsion act along the shortest separation between the
+    periodic images of two particles (minimum image convention). That is only
+    unambiguous while springs and the repulsion radius are shorter than half
+    the box.
+    """
+    periodic = True
+
+    def __init__(self, size):
+        self.size = (float(size[0]), float(size[1]))
+
+    def apply(self, particles):
+        W, H = self.size
+        for p in particles:
+            # shift pos and prev_pos together so the velocity is kept
+            sx = p.pos.x // W * W
+            if sx:
+                p.pos.x -= sx
+                p.prev_pos.x -= sx
+            sy = p.pos.y // H * H
+            if sy:
+                p.pos.y -= sy
+                p.prev_pos.y -= sy
+
+    def apply_arrays(self, pos, prev_pos):
+        shift = pos // self.size * self.size
+        pos -= shift
+        prev_pos -= shift
+
+    def wrap_xy(self, dx, dy):
+        W, H = self.size
+        return dx - (dx / W + 0.5) // 1 * W, dy - (dy / H + 0.5) // 1 * H
+
+    def wrap(self, delta):
+        return delta - (delta / self.size + 0.5) // 1 * self.size
+
+    def to_dict(self) -> dict:
+        return {"type": "periodic", "size": list(self.size)}
+
+
+def boundary_from_dict(d: dict) -> Boundary:
+    """Inverse of Boundary.to_dict."""
+    if d["type"] == "clamp":
+        return Clamp(d["size"], d["bouncy"])
+    if d["type"] == "periodic":
+        return Periodic(d["size"])
+    return Boundary()
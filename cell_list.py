@@ -0,0 +1,122 @@
+# cell_list.py
+import numpy as np
+from spatial_hash import HALF_SHELL, periodic_shape, periodic_offsets
+
+
+def expand_ranges(lo, hi):
+    """
+    For every k return (k, lo[k]), (k, lo[k] + 1), ..., (k, hi[k] - 1) as two
+    flat index arrays, without a Python loop over k.
+    """
+    lens = np.maximum(hi - lo, 0)
+    total = int(lens.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    src = np.repeat(np.arange(len(lo)), lens)
+    # offset of every element inside its own range
+    starts = np.cumsum(lens) - lens
+    inner = np.arange(total) - np.repeat(starts, lens)
+    return src, lo[src] + inner
+
+
+def grid_pairs(pos: np.ndarray, cell_size: float, box=None):
+    """
+    Vectorized cell-list broadphase. Returns index arrays (i, j), i != j, of every
+    pair of points that share a cell or sit in adjacent cells of a grid with the
+    given cell size; each unordered pair appears once. Points with non-finite
+    coordinates are ignored. With box = (W, H) the grid is periodic, split into
+    cells by spatial_hash.periodic_shape.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    valid = np.flatnonzero(np.isfinite(pos).all(axis=1))
+    if len(valid) < 2:
+        return empty, empty
+    if box is None:
+        cells = np.floor(pos[valid] / cell_size).astype(np.int64)
+        cells -= cells.min(axis=0)
+        # one empty row/column of padding on every side so neighbour keys never alias
+        nx = int(cells[:, 0].max()) + 3
+        ny = int(cells[:, 1].max()) + 3
+        cells += 1
+        offsets = HALF_SHELL
+    else:
+        (wx, nx), (wy, ny) = periodic_shape(box, cell_size)
+        cells = np.floor(pos[valid] / (wx, wy)).astype(np.int64) % (nx, ny)
+        offsets = periodic_offsets(nx, ny)
+    keys = cells[:, 0] * ny + cells[:, 1]
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    cell_keys, cell_start, cell_count = np.unique(sorted_keys, return_index=True, return_counts=True)
+    cell_end = cell_start + cell_count
+    # position of every (sorted) point's own cell in cell_keys
+    own = np.repeat(np.arange(len(cell_keys)), cell_count)
+
+    # partners inside the same cell: the points sorted after it
+    src, dst = expand_ranges(np.arange(len(sorted_keys)) + 1, cell_end[own])
+    src_all, dst_all = [src], [dst]
+
+    cx, cy = cell_keys // ny, cell_keys % ny
+    for dx, dy in offsets:
+        if box is None:
+            target = cell_keys + dx * ny + dy
+        else:
+            target = (cx + dx) % nx * ny + (cy + dy) % ny
+        idx = np.searchsorted(cell_keys, target)
+        idx_clipped = np.minimum(idx, len(cell_keys) - 1)
+        found = (idx < len(cell_keys)) & (cell_keys[idx_clipped] == target)
+        lo = np.where(found, cell_start[idx_clipped], 0)
+        hi = np.where(found, cell_end[idx_clipped], 0)
+        # every point of a cell is paired with the whole neighbour range
+        src, dst = expand_ranges(lo[own], hi[own])
+        src_all.append(src)
+        dst_all.append(dst)
+
+    src = np.concatenate(src_all)
+    dst = np.concatenate(dst_all)
+    return valid[order[src]], valid[order[dst]]
+
+
+class ArrayNeighbourList:
+    """neighbour_list.NeighbourList for an (N, 2) position array, built with grid_pairs."""
+    def __init__(self):
+        self.i = self.j = np.empty(0, dtype=np.int64)
+        self.rebuilds = 0
+        self._ref = None
+        self._key = None
+
+    def invalidate(self):
+        self._key = None
+
+    def update(self, pos: np.ndarray, radius: float, skin: float, boundary, exclusions=None):
+        """
+        Index arrays (i, j) of the candidate pairs for positions pos, rebuilt if
+        needed, without the pairs excluded by exclusions (an ArrayExclusions).
+        """
+        box = boundary.size if boundary.periodic else None
+        key = (len(pos), radius, skin, box, exclusions and exclusions.version)
+        if key != self._key or self._moved(pos, skin, boundary):
+            self._build(pos, radius + skin, boundary, exclusions)
+            self._key = key
+        return self.i, self.j
+
+    def _moved(self, pos, skin, boundary) -> bool:
+        d = pos - self._ref
+        if boundary.periodic:
+            d = boundary.wrap(d)
+        return bool(np.max(d[:, 0] ** 2 + d[:, 1] ** 2, initial=0.0) > (skin / 2) ** 2)
+
+    def _build(self, pos, cutoff, boundary, exclusions):
+        box = boundary.size if boundary.periodic else None
+        i, j = grid_pairs(pos, cutoff, box)
+        if exclusions is not None:
+            keep = ~exclusions.mask(i, j)
+            i, j = i[keep], j[keep]
+        delta = pos[j] - pos[i]
+        if box is not None:
+            delta = boundary.wrap(delta)
+        close = delta[:, 0] ** 2 + delta[:, 1] ** 2 < cutoff * cutoff
+        self.i, self.j = i[close], j[close]
+        self._ref = pos.copy()
+        self.rebuilds += 1
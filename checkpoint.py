@@ -0,0 +1,298 @@
+# checkpoint.py
+"""
+Save and restore the complete state of an engine: particles, springs,
+bending springs, engine parameters and the state of the random generator
+used for the Brownian forces, so a restored run continues bit-identically.
+
+The file is an uncompressed .npz archive of flat arrays plus one JSON
+string for the scalar parameters. load_checkpoint builds a new scene from
+it; restore_checkpoint writes it into an engine that already holds the same
+scene (e.g. rebuilt with the same builder after a crash), which for
+VectorizedPhysicsEngine is a handful of array copies and does not create
+any Python objects.
+"""
+import json
+
+import numpy as np
+
+from particle import Particle
+from spring import Spring
+from bending_spring import BendingSpring
+from bending_set import BendingSet
+from physics import PhysicsEngine, check_adaptive_dt
+from vectorized_physics import VectorizedPhysicsEngine
+from boundaries import boundary_from_dict
+from backends import BACKENDS, engine_class as backend_class
+
+# 4: neighbour_skin, exclusions, solver, adaptive_dt, respa_substeps and the clock
+FORMAT_VERSION = 4
+
+
+def _engine_class(name: str) -> type:
+    # imported on demand, so only the engine that was saved gets loaded
+    for backend, (_, class_name) in BACKENDS.items():
+        if class_name == name:
+            return backend_class(backend)
+    raise ValueError(f"unknown engine {name!r}")
+
+
+def _spring_ends(springs, index) -> np.ndarray:
+    return np.array([(index[id(s.p1)], index[id(s.p2)]) for s in springs], dtype=np.int64).reshape(-1, 2)
+
+
+def _bending_ends(bending_springs, index) -> np.ndarray:
+    return np.array([(index[id(bs.p1)], index[id(bs.p2)], index[id(bs.p3)]) for bs in bending_springs],
+                    dtype=np.int64).reshape(-1, 3)
+
+
+def save_checkpoint(path: str, physics: PhysicsEngine):
+    """Write the state of physics to path."""
+    particles = physics.particles
+    index = {id(p): i for i, p in enumerate(particles)}
+    n = len(particles)
+
+    tags = [p.tag for p in particles]
+    tag_table = list(dict.fromkeys(tags))
+    tag_codes = {tag: i for i, tag in enumerate(tag_table)}
+    bending_springs = physics.bending_springs or []
+
+    if isinstance(physics, VectorizedPhysicsEngine):
+        # the arrays are the reference state, the objects are synced from them
+        state = {"pos": physics.pos.copy(), "prev_pos": physics.prev_pos.copy(), "acc": physics.acc.copy(),
+                 "mass": physics.mass.copy()}
+    else:
+        state = {
+            "pos": np.array([(p.pos.x, p.pos.y) for p in particles], dtype=float).reshape(n, 2),
+            "prev_pos": np.array([(p.prev_pos.x, p.prev_pos.y) for p in particles], dtype=float).reshape(n, 2),
+            "acc": np.array([(p.acc.x, p.acc.y) for p in particles], dtype=float).reshape(n, 2),
+            "mass": np.array([p.mass for p in particles], dtype=float),
+        }
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "engine": type(physics).__name__,
+        "params": {
+            "gravity": [physics.gravity.x, physics.gravity.y],
+            "repulsion_radius": physics.repulsion_radius,
+            "repulsion_strength": physics.repulsion_strength,
+            "temperature": physics.temperature,
+            "damping_coeff": physics.damping_coeff,
+            "neighbour_skin": physics.neighbour_skin,
+            "exclude_bonded": physics.exclusions.bonded,
+            "exclude_same_tag": physics.exclusions.same_tag,
+            "solver": physics.solver,
+            "xpbd_iterations": physics.xpbd_iterations,
+            "adaptive_dt": physics.adaptive_dt and list(physics.adaptive_dt),
+            "respa_substeps": physics.respa_substeps,
+        },
+        "clock": {"steps": physics.steps, "last_dt": physics.last_dt, "time_debt": physics.time_debt},
+        "boundary": physics.boundary.to_dict(),
+        "has_bending_springs": physics.bending_springs is not None,
+        "tags": tag_table,
+        "noise": physics.noise.get_state(),
+    }
+    arrays = {
+        "meta": np.array(json.dumps(meta)),
+        **state,
+        "fixed": np.fromiter((p.fixed for p in particles), dtype=bool, count=n),
+        "tag": np.array([tag_codes[tag] for tag in tags], dtype=np.int32),
+        # None color / radius as a mask / nan
+        "has_color": np.array([p.color is not None for p in particles], dtype=bool),
+        "color": np.array([p.color or (0, 0, 0) for p in particles], dtype=np.uint8).reshape(n, 3),
+        "radius": np.array([np.nan if p.radius is None else p.radius for p in particles], dtype=float),
+
+        "spring_ends": _spring_ends(physics.springs, index),
+        "rest_length": np.array([s.rest_length for s in physics.springs], dtype=float),
+        "stiffness": np.array([s.stiffness for s in physics.springs], dtype=float),
+        "max_force": np.array([np.nan if s.max_force is None else s.max_force for s in physics.springs], dtype=float),
+        "broken": np.array([s.broken for s in physics.springs], dtype=bool),
+        "invisible": np.array([s.invisible for s in physics.springs], dtype=bool),
+
+        "bending_ends": _bending_ends(bending_springs, index),
+        "rest_angle": np.array([bs.rest_angle for bs in bending_springs], dtype=float),
+        "bending_stiffness": np.array([bs.stiffness for bs in bending_springs], dtype=float),
+        "signed": np.array([bs.signed for bs in bending_springs], dtype=bool),
+    }
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def _read(path: str):
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    meta = json.loads(str(arrays["meta"]))
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint version {meta['version']}")
+    return meta, arrays
+
+
+def _set_clock(physics, meta):
+    # step count and the adaptive stepping state
+    clock = meta["clock"]
+    physics.steps = clock["steps"]
+    physics.last_dt = clock["last_dt"]
+    physics.time_debt = clock["time_debt"]
+    physics.spatial_index.invalidate()
+
+
+def load_checkpoint(path: str, engine_class=None) -> PhysicsEngine:
+    """
+    Rebuild the engine saved in path with fresh Particle/Spring objects.
+    engine_class overrides the engine type that was saved; the noise then
+    keeps its seed and step but restarts a sequential stream.
+    """
+    meta, arrays = _read(path)
+
+    tags = meta["tags"]
+    particles = []
+    for pos, prev_pos, acc, mass, fixed, tag, has_color, color, radius in zip(
+            arrays["pos"].tolist(), arrays["prev_pos"].tolist(), arrays["acc"].tolist(),
+            arrays["mass"].tolist(), arrays["fixed"].tolist(), arrays["tag"].tolist(),
+            arrays["has_color"].tolist(), arrays["color"].tolist(), arrays["radius"].tolist()):
+        p = Particle(pos, mass=mass, color=tuple(color) if has_color else None,
+                     radius=None if radius != radius else radius, tag=tags[tag])
+        p.prev_pos.update(prev_pos)
+        p.acc.update(acc)
+        p.fixed = fixed
+        particles.append(p)
+
+    springs = []
+    for (a, b), rest, k, max_force, broken, invisible in zip(
+            arrays["spring_ends"].tolist(), arrays["rest_length"].tolist(), arrays["stiffness"].tolist(),
+            arrays["max_force"].tolist(), arrays["broken"].tolist(), arrays["invisible"].tolist()):
+        s = Spring(particles[a], particles[b], rest, k,
+                   max_force=None if max_force != max_force else max_force, invisible=invisible)
+        s.broken = broken
+        springs.append(s)
+
+    bending_springs = None
+    if meta["has_bending_springs"]:
+        bending_springs = [
+            BendingSpring(particles[a], particles[b], particles[c], rest_angle=rest, stiffness=k, signed=signed)
+            for (a, b, c), rest, k, signed in zip(
+                arrays["bending_ends"].tolist(), arrays["rest_angle"].tolist(),
+                arrays["bending_stiffness"].tolist(), arrays["signed"].tolist())
+        ]
+
+    engine_class = engine_class or _engine_class(meta["engine"])
+    physics = engine_class(particles, springs, bending_springs, boundary=boundary_from_dict(meta["boundary"]),
+                           **meta["params"])
+    physics.noise.set_state(meta["noise"])
+    _set_clock(physics, meta)
+    return physics
+
+
+def restore_checkpoint(path: str, physics: PhysicsEngine, sync: bool = True):
+    """
+    Write the state saved in path into physics, which must hold the same
+    scene: the same number of particles, springs and bending springs with the
+    same connectivity (ValueError otherwise), and be of the engine type that
+    was saved. Spring and bending spring parameters and the particle tags are
+    restored along with the state.
+    For VectorizedPhysicsEngine, sync=False leaves the positions of the
+    Particle objects to the next physics.sync() (the end of the next update,
+    see sync_every_step) instead of writing them now.
+    """
+    meta, arrays = _read(path)
+    if type(physics).__name__ != meta["engine"]:
+        raise ValueError(f"{path} holds a {meta['engine']} state, not a {type(physics).__name__} one")
+    particles = physics.particles
+    n = len(particles)
+    bending_springs = physics.bending_springs or []
+    if n != len(arrays["pos"]) or len(physics.springs) != len(arrays["spring_ends"]) \
+            or len(bending_springs) != len(arrays["bending_ends"]):
+        raise ValueError(f"{path} was saved from a different scene")
+    index = {id(p): i for i, p in enumerate(particles)}
+    if not np.array_equal(_spring_ends(physics.springs, index), arrays["spring_ends"]) \
+            or not np.array_equal(_bending_ends(bending_springs, index), arrays["bending_ends"]):
+        raise ValueError(f"{path} was saved from a different scene (springs or bending springs connect "
+                         f"other particles)")
+
+    params = meta["params"]
+    physics.gravity.update(params["gravity"])
+    physics.repulsion_radius = params["repulsion_radius"]
+    physics.repulsion_strength = params["repulsion_strength"]
+    physics.temperature = params["temperature"]
+    physics.damping_coeff = params["damping_coeff"]
+    physics.boundary = boundary_from_dict(meta["boundary"])
+    physics.neighbour_skin = params["neighbour_skin"]
+    physics.exclusions.bonded = params["exclude_bonded"]
+    physics.exclusions.same_tag = params["exclude_same_tag"]
+    physics.solver = params["solver"]
+    physics.xpbd_iterations = params["xpbd_iterations"]
+    physics.adaptive_dt = check_adaptive_dt(params["adaptive_dt"])
+    physics.respa_substeps = params["respa_substeps"]
+    physics.neighbours.invalidate()
+
+    # tags and bending springs live on the objects for both engines
+    tags = meta["tags"]
+    for p, code in zip(particles, arrays["tag"].tolist()):
+        p.tag = tags[code]
+    physics.exclusions.invalidate()
+    resorted = False
+    for bs, rest, k, signed in zip(bending_springs, arrays["rest_angle"].tolist(),
+                                   arrays["bending_stiffness"].tolist(), arrays["signed"].tolist()):
+        bs.rest_angle = rest
+        bs.stiffness = k
+        resorted |= bs.signed != signed
+        bs.signed = signed
+
+    fixed = arrays["fixed"]
+    if isinstance(physics, VectorizedPhysicsEngine):
+        physics.begin_step()  # picks up list changes and the current fixed flags
+        physics.pos[:] = arrays["pos"]
+        physics.prev_pos[:] = arrays["prev_pos"]
+        physics.acc[:] = arrays["acc"]
+        changed_mass = np.flatnonzero(physics.mass != arrays["mass"])
+        changed_fixed = np.flatnonzero(physics.fixed != fixed)
+        physics.mass[:] = arrays["mass"]
+        physics.fixed[:] = fixed
+        physics._update_inv_mass()
+        physics.noise.invalidate()
+        # only what differs is written to the objects
+        for i in np.union1d(changed_mass, changed_fixed).tolist():
+            particles[i].mass = float(arrays["mass"][i])
+            particles[i].fixed = bool(fixed[i])
+        springs = physics.spring_set
+        for name in ("rest_length", "stiffness", "broken"):
+            saved = arrays[name]
+            for k in np.flatnonzero(getattr(springs, name) != saved).tolist():
+                setattr(physics.springs[k], name, saved[k].item())
+        # the set stores a missing max_force as inf, the file as nan
+        saved_max = np.where(np.isnan(arrays["max_force"]), np.inf, arrays["max_force"])
+        for k in np.flatnonzero(springs.max_force != saved_max).tolist():
+            physics.springs[k].max_force = None if np.isinf(saved_max[k]) else float(saved_max[k])
+        springs.rest_length[:] = arrays["rest_length"]
+        springs.stiffness[:] = arrays["stiffness"]
+        springs.max_force[:] = saved_max
+        springs.broken[:] = arrays["broken"]
+        if resorted:
+            # the BendingSet keeps unsigned springs first
+            physics.bending_set = BendingSet(physics.bending_springs, physics.index)
+        physics.springs_changed()
+        physics._synced = False
+        if sync:
+            physics.sync()
+        else:
+            # begin_step reads fixed particles from their objects
+            for i in np.flatnonzero(fixed).tolist():
+                particles[i].pos.update(physics.pos[i].tolist())
+                particles[i].prev_pos.update(physics.prev_pos[i].tolist())
+    else:
+        for p, pos, prev_pos, acc, mass, is_fixed in zip(
+                particles, arrays["pos"].tolist(), arrays["prev_pos"].tolist(), arrays["acc"].tolist(),
+                arrays["mass"].tolist(), fixed.tolist()):
+            p.pos.update(pos)
+            p.prev_pos.update(prev_pos)
+            p.acc.update(acc)
+            p.mass = mass
+            p.fixed = is_fixed
+        for s, rest, k, max_force, broken in zip(
+                physics.springs, arrays["rest_length"].tolist(), arrays["stiffness"].tolist(),
+                arrays["max_force"].tolist(), arrays["broken"].tolist()):
+            s.rest_length = rest
+            s.stiffness = k
+            s.max_force = None if max_force != max_force else max_force
+            s.broken = broken
+    physics.noise.set_state(meta["noise"])
+    _set_clock(physics, meta)
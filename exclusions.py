@@ -0,0 +1,94 @@
+# exclusions.py
+"""
+Pairs of particles that are left out of the repulsion: particles joined by
+springs already keep their distance through them, repelling them as well
+costs pair evaluations and fights the springs' rest lengths.
+"""
+from collections import defaultdict
+
+from spring import Spring
+
+
+def bonded_pairs(bonds, angles, depth: int) -> set:
+    """
+    Pairs (a, b), a < b, up to depth bonds apart: depth 1 gives the ends of
+    every bond and the two edges of every angle (1-2 pairs), depth 2 adds the
+    outer particles of every angle and particles with a common bonded
+    neighbour (1-3 pairs). bonds are (a, b) and angles (a, vertex, c) tuples
+    of any orderable keys.
+    """
+    pairs = set()
+    if depth < 1:
+        return pairs
+    neighbours = defaultdict(set)
+    for a, b in bonds:
+        if a != b:
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+    for a, b, c in angles:
+        for u, v in ((a, b), (b, c)):
+            if u != v:
+                neighbours[u].add(v)
+                neighbours[v].add(u)
+    for a, partners in neighbours.items():
+        for b in partners:
+            if a < b:
+                pairs.add((a, b))
+    if depth >= 2:
+        for a, b, c in angles:
+            if a != c:
+                pairs.add((a, c) if a < c else (c, a))
+        for partners in neighbours.values():
+            ordered = sorted(partners)
+            for k, a in enumerate(ordered):
+                for b in ordered[k + 1:]:
+                    pairs.add((a, b))
+    return pairs
+
+
+class Exclusions:
+    """
+    Repulsion exclusions of PhysicsEngine. bonded = 0 excludes nothing, 1 the
+    1-2 pairs and 2 also the 1-3 pairs of the spring and bending spring
+    connectivity (see bonded_pairs); same_tag excludes all pairs of particles
+    with the same tag (other than None). Recomputed when the particle or
+    spring lists change or a spring breaks or is mended (Spring.broken_changes).
+    """
+    def __init__(self, bonded: int = 0, same_tag: bool = False):
+        self.bonded = bonded
+        self.same_tag = same_tag
+        # id(particle) -> ids of the particles it does not repel
+        self.partners = {}
+        # changes whenever the excluded pairs do
+        self.version = 0
+        self._key = None
+
+    def invalidate(self):
+        """Recompute on the next update, e.g. after tags changed."""
+        self._key = None
+
+    @property
+    def active(self) -> bool:
+        return self.bonded > 0 or self.same_tag
+
+    def update(self, particles, springs, bending_springs):
+        key = (id(particles), len(particles), id(springs), len(springs), id(bending_springs),
+               len(bending_springs or ()), Spring.broken_changes, self.bonded, self.same_tag)
+        if key == self._key:
+            return
+        self._key = key
+        self.version += 1
+        bending_springs = bending_springs or []
+        pairs = bonded_pairs(((id(s.p1), id(s.p2)) for s in springs if not s.broken),
+                             ((id(bs.p1), id(bs.p2), id(bs.p3)) for bs in bending_springs), self.bonded)
+        partners = defaultdict(set)
+        for a, b in pairs:
+            partners[a].add(b)
+            partners[b].add(a)
+        self.partners = dict(partners)
+
+    def excludes(self, p1, p2) -> bool:
+        if self.same_tag and p1.tag is not None and p1.tag == p2.tag:
+            return True
+        partners = self.partners.get(id(p1))
+        return partners is not None and id(p2) in partners
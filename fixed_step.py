@@ -0,0 +1,44 @@
+# fixed_step.py
+
+
+class FixedStepper:
+    """
+    Runs a PhysicsEngine at a fixed rate independent of the frame rate.
+
+    Every frame, advance(frame_time) adds the real time that passed to an
+    accumulator and runs as many physics steps of 1/hz as fit into it. What
+    is left over is kept for the next frame, and alpha tells how far between
+    the last two steps the frame falls, for Renderer.draw(..., alpha=).
+    If the physics can't keep up, at most max_frame_time of real time is
+    simulated per frame, so the simulation slows down instead of falling
+    further and further behind.
+    """
+    def __init__(self, physics, hz: float = 120, max_frame_time: float = 0.1, after_step=None):
+        self.physics = physics
+        self.dt = 1 / hz
+        self.max_frame_time = max_frame_time
+        # called after every physics step, e.g. to apply boundaries
+        self.after_step = after_step
+        self.accumulator = 0.0
+        self.steps = 0
+
+    def advance(self, frame_time: float) -> int:
+        """Simulate frame_time seconds of real time, returns the number of physics steps run."""
+        self.accumulator += min(frame_time, self.max_frame_time)
+        n = 0
+        while self.accumulator >= self.dt:
+            self.physics.update(self.dt)
+            if self.after_step is not None:
+                self.after_step()
+            self.accumulator -= self.dt
+            n += 1
+        if n:
+            # engines that do not update the Particle objects every step do it once per frame
+            self.physics.sync()
+        self.steps += n
+        return n
+
+    @property
+    def alpha(self) -> float:
+        """Fraction of a physics step the accumulator holds, in [0, 1)."""
+        return self.accumulator / self.dt
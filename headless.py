@@ -0,0 +1,104 @@
+# headless.py
+"""
+Run a scene without a window: PhysicsEngine.update is advanced with a fixed dt
+as fast as the CPU allows, without frame limiter, event loop or drawing.
+
+    python headless.py --scene rod --steps 5000 --engine vectorized
+"""
+import argparse
+import time
+
+from physics import PhysicsEngine
+from backends import available_engines
+from scenes import SCENES
+from observables import Observables, open_sink
+
+# the backends that can be used here, see backends.py
+ENGINES = available_engines()
+
+
+def build_engine(scene: str, engine: str = "object", **overrides):
+    """Build a scene from scenes.SCENES and wrap it in an engine; overrides replace engine keyword arguments."""
+    particles, springs, bending_springs, params = SCENES[scene]()
+    params.update(overrides)
+    return ENGINES[engine](particles, springs, bending_springs, **params)
+
+
+def run_headless(physics: PhysicsEngine, steps: int, dt: float = 1 / 120, report_every: int = 0):
+    """
+    Advance physics by steps fixed steps of dt. Prints the running rate every
+    report_every steps (0 = never). Returns a dict with the timing summary.
+    """
+    rebuilds_before = physics.count_neighbour_rebuilds()
+    physics_steps_before = physics.steps
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+        physics.update(dt)
+        if report_every and step % report_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"step {step}/{steps}: {step / elapsed:.1f} steps/s")
+    elapsed = time.perf_counter() - start
+    return {
+        "steps": steps,
+        "dt": dt,
+        "particles": len(physics.particles),
+        "elapsed": elapsed,
+        "steps_per_second": steps / elapsed if elapsed > 0 else float("inf"),
+        "simulated_time": steps * dt,
+        "neighbour_rebuilds": physics.count_neighbour_rebuilds() - rebuilds_before,
+        # with adaptive_dt an update can take several or no physics steps
+        "physics_steps": physics.steps - physics_steps_before,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scene", choices=sorted(SCENES), default="coccus")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="object")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--dt", type=float, default=1 / 120)
+    parser.add_argument("--report-every", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=None, help="seed of the Brownian forces")
+    parser.add_argument("--neighbour-skin", type=float, default=0,
+                        help="use a Verlet neighbour list with this skin for the repulsion")
+    parser.add_argument("--solver", choices=("force", "xpbd"), default="force",
+                        help="springs as forces or as XPBD constraints")
+    parser.add_argument("--adaptive", type=float, nargs=2, metavar=("DT_MIN", "DT_MAX"), default=None,
+                        help="step with the largest stable dt within these bounds")
+    parser.add_argument("--respa", type=int, default=1, metavar="N",
+                        help="step springs and bending N times per step of the other forces")
+    parser.add_argument("--observe", metavar="PATH", default=None,
+                        help="append energies, temperature and areas to PATH (.csv or binary)")
+    parser.add_argument("--observe-every", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes of the parallel engine")
+    args = parser.parse_args(argv)
+
+    overrides = {"workers": args.workers} if args.engine == "parallel" else {}
+    physics = build_engine(args.scene, args.engine, seed=args.seed, neighbour_skin=args.neighbour_skin,
+                           solver=args.solver, adaptive_dt=args.adaptive,
+                           respa_substeps=args.respa, **overrides)
+    observables = None
+    if args.observe:
+        observables = Observables(physics, every=args.observe_every, sink=open_sink(args.observe))
+    result = run_headless(physics, args.steps, args.dt, args.report_every)
+    if observables is not None:
+        observables.close()
+    if hasattr(physics, "close"):
+        physics.close()
+    print(f"{args.scene} ({args.engine}, {result['particles']} particles): "
+          f"{result['steps']} steps in {result['elapsed']:.2f} s, "
+          f"{result['steps_per_second']:.1f} steps/s, "
+          f"{result['simulated_time']:.2f} s simulated")
+    if args.adaptive:
+        print(f"{result['physics_steps']} physics steps "
+              f"(mean dt {result['simulated_time'] / max(result['physics_steps'], 1):.5f})")
+    if observables is not None:
+        print(f"{observables.latest()['temperature']:.3g} effective temperature at the end, sampling took "
+              f"{observables.elapsed / result['elapsed'] * 100:.1f} % of the run")
+    if args.neighbour_skin > 0:
+        print(f"neighbour list rebuilt {result['neighbour_rebuilds']} times "
+              f"(every {result['physics_steps'] / max(result['neighbour_rebuilds'], 1):.1f} physics steps)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# jit_physics.py
+"""
+VectorizedPhysicsEngine with the per-element loops of the springs, the
+repulsion, the drag and the integration compiled by numba, which saves the
+temporary arrays of the NumPy versions. Pair finding, bending and the noise
+stay as in VectorizedPhysicsEngine, so a seeded run draws the same random
+numbers. Needs numba; see backends.create_engine for a fallback without it.
+"""
+import numba
+import numpy as np
+from vectorized_physics import VectorizedPhysicsEngine
+
+
+@numba.njit(cache=True, inline="always")
+def _wrap(d, length):
+    # minimum image of a separation along one axis, length 0 for no periodicity
+    if length > 0:
+        return d - np.floor(d / length + 0.5) * length
+    return d
+
+
+@numba.njit(cache=True)
+def spring_kernel(pos, acc, inv_mass, p1, p2, rest_length, stiffness, max_force, broken, snapped, W, H):
+    """Same as SpringSet.apply, accumulating accelerations; flags newly broken springs in snapped."""
+    n_snapped = 0
+    for k in range(len(p1)):
+        if broken[k]:
+            continue
+        a = p1[k]
+        b = p2[k]
+        dx = _wrap(pos[b, 0] - pos[a, 0], W)
+        dy = _wrap(pos[b, 1] - pos[a, 1], H)
+        dist = np.sqrt(dx * dx + dy * dy)
+        if dist == 0:
+            continue
+        scale = stiffness[k] * (dist - rest_length[k]) / dist * 0.5
+        if abs(scale) * dist > max_force[k]:
+            broken[k] = True
+            snapped[k] = True
+            n_snapped += 1
+            continue
+        fx = dx * scale
+        fy = dy * scale
+        acc[a, 0] += fx * inv_mass[a]
+        acc[a, 1] += fy * inv_mass[a]
+        acc[b, 0] -= fx * inv_mass[b]
+        acc[b, 1] -= fy * inv_mass[b]
+    return n_snapped
+
+
+@numba.njit(cache=True)
+def repulsion_kernel(pos, acc, inv_mass, i, j, radius, strength, W, H):
+    """Linear repulsion between the candidate pairs (i[k], j[k]) closer than radius."""
+    for k in range(len(i)):
+        a = i[k]
+        b = j[k]
+        dx = _wrap(pos[b, 0] - pos[a, 0], W)
+        dy = _wrap(pos[b, 1] - pos[a, 1], H)
+        dist = np.sqrt(dx * dx + dy * dy)
+        if dist > 0 and dist < radius:
+            scale = strength * (radius - dist) / (radius * dist)
+            fx = dx * scale
+            fy = dy * scale
+            acc[b, 0] += fx * inv_mass[b]
+            acc[b, 1] += fy * inv_mass[b]
+            acc[a, 0] -= fx * inv_mass[a]
+            acc[a, 1] -= fy * inv_mass[a]
+
+
+@numba.njit(cache=True)
+def drag_kernel(pos, prev_pos, acc, free, gamma, dt, normals, scale):
+    """Viscous drag -γ·v and the Brownian accelerations normals * scale of the free particles."""
+    for k in range(len(free)):
+        a = free[k]
+        acc[a, 0] += normals[k, 0] * scale[k] - gamma * (pos[a, 0] - prev_pos[a, 0]) / dt
+        acc[a, 1] += normals[k, 1] * scale[k] - gamma * (pos[a, 1] - prev_pos[a, 1]) / dt
+
+
+@numba.njit(cache=True)
+def integrate_kernel(pos, prev_pos, acc, fixed, dt, damping):
+    dt2 = dt * dt
+    for a in range(len(pos)):
+        if not fixed[a]:
+            for axis in range(2):
+                x = pos[a, axis]
+                pos[a, axis] = x + (x - prev_pos[a, axis]) * damping + acc[a, axis] * dt2
+                prev_pos[a, axis] = x
+        acc[a, 0] = 0.0
+        acc[a, 1] = 0.0
+
+
+class JitPhysicsEngine(VectorizedPhysicsEngine):
+    """VectorizedPhysicsEngine with numba kernels for the hot loops, see the module docstring."""
+
+    def _box(self):
+        # (W, H) for the kernels, zeros without periodic boundary
+        if self.boundary.periodic:
+            return self.boundary.size
+        return 0.0, 0.0
+
+    def apply_springs(self):
+        if not self.springs or self.solver == "xpbd":
+            return
+        ss = self.spring_set
+        snapped = np.zeros(len(ss), dtype=bool)
+        if spring_kernel(self.pos, self.acc, self.inv_mass, ss.p1, ss.p2, ss.rest_length, ss.stiffness,
+                         ss.max_force, ss.broken, snapped, *self._box()):
+            for k in np.flatnonzero(snapped):
+                ss.springs[k].broken = True
+
+    def apply_repulsion(self):
+        r = self.repulsion_radius
+        self._pair_tests = 0
+        if r <= 0 or len(self.pos) < 2:
+            return
+        i, j = self._repulsion_pairs()
+        repulsion_kernel(self.pos, self.acc, self.inv_mass, i, j, float(r), float(self.repulsion_strength),
+                         *self._box())
+
+    def apply_drag(self, dt):
+        free = np.flatnonzero(~self.fixed)
+        scale = self.noise.accel_scale(self.mass, self.temperature, self.damping_coeff, dt)[free]
+        drag_kernel(self.pos, self.prev_pos, self.acc, free, float(self.damping_coeff), dt,
+                    self.noise.normals(free), scale)
+        self.noise.advance()
+
+    def integrate(self, dt, damping=0.98):
+        integrate_kernel(self.pos, self.prev_pos, self.acc, self.fixed, dt, damping)
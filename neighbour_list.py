@@ -0,0 +1,69 @@
+# neighbour_list.py
+from spatial_hash import SpatialHash
+
+
+class NeighbourList:
+    """
+    Verlet neighbour list for the repulsion: the pairs closer than
+    radius + skin are collected with a SpatialHash and reused in later steps
+    until some particle has moved more than skin / 2 since then; before that
+    no pair can have come closer than radius without being in the list.
+    A larger skin means fewer rebuilds but more pairs to test per step.
+    """
+    def __init__(self):
+        self.grid = SpatialHash(1)
+        self.pairs = []
+        # how often the list was rebuilt
+        self.rebuilds = 0
+        # positions at the last rebuild and what the list was built for
+        self._ref = None
+        self._key = None
+
+    def invalidate(self):
+        self._key = None
+
+    def update(self, particles, radius: float, skin: float, boundary, exclusions=None) -> list:
+        """
+        The candidate pairs for the current positions, rebuilt if needed.
+        Pairs excluded by exclusions (an Exclusions) are left out.
+        """
+        box = boundary.size if boundary.periodic else None
+        key = (len(particles), radius, skin, box, exclusions and exclusions.version)
+        if key != self._key or self._moved(particles, skin, boundary):
+            self._build(particles, radius + skin, boundary, exclusions)
+            self._key = key
+        return self.pairs
+
+    def _moved(self, particles, skin, boundary) -> bool:
+        # whether any particle moved more than skin / 2 since the last rebuild
+        limit = (skin / 2) ** 2
+        wrap = boundary.wrap_xy if boundary.periodic else None
+        for p, (x, y) in zip(particles, self._ref):
+            dx = p.pos.x - x
+            dy = p.pos.y - y
+            if wrap is not None:
+                dx, dy = wrap(dx, dy)
+            if dx * dx + dy * dy > limit:
+                return True
+        return False
+
+    def _build(self, particles, cutoff, boundary, exclusions):
+        grid = self.grid
+        grid.cell_size = cutoff
+        grid.box = boundary.size if boundary.periodic else None
+        grid.build(particles)
+        wrap = boundary.wrap_xy if boundary.periodic else None
+        cutoff2 = cutoff * cutoff
+        pairs = []
+        for p1, p2 in grid.pairs():
+            if exclusions is not None and exclusions.excludes(p1, p2):
+                continue
+            dx = p2.pos.x - p1.pos.x
+            dy = p2.pos.y - p1.pos.y
+            if wrap is not None:
+                dx, dy = wrap(dx, dy)
+            if dx * dx + dy * dy < cutoff2:
+                pairs.append((p1, p2))
+        self.pairs = pairs
+        self._ref = [(p.pos.x, p.pos.y) for p in particles]
+        self.rebuilds += 1
@@ -0,0 +1,108 @@
+# noise.py
+"""
+Brownian forces for the drag phase: Gaussian noise with variance
+2·γ·T·m / dt (with k_B = 1) per force component.
+
+Two kinds of streams are supported:
+- sequential (default): normals are drawn one after the other from a
+  generator seeded with `seed`, reproducible as long as the particles are
+  visited in the same order.
+- counter based: the normals of particle i in step s are a pure function of
+  (seed, s, i), so a run gives the same result however the particles are
+  split up or ordered, e.g. across worker processes.
+"""
+import math
+import random
+
+MASK64 = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+
+def mix64(z: int) -> int:
+    """splitmix64 finalizer, a bijective scramble of a 64 bit integer."""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def step_key(seed: int, step: int) -> int:
+    """Key of one step of a counter based stream."""
+    return mix64(mix64((seed + GOLDEN) & MASK64) ^ (step & MASK64))
+
+
+def counter_normals(key: int, i: int) -> tuple[float, float]:
+    """Two standard normals for particle i, from the key of a step (Box-Muller)."""
+    h = mix64(key ^ ((i * GOLDEN) & MASK64))
+    # 53 bit uniforms, u1 in (0, 1] so that log(u1) is finite
+    u1 = ((mix64((h + GOLDEN) & MASK64) >> 11) + 1) * 2.0 ** -53
+    u2 = (mix64((h + 2 * GOLDEN) & MASK64) >> 11) * 2.0 ** -53
+    r = math.sqrt(-2.0 * math.log(u1))
+    theta = 2.0 * math.pi * u2
+    return r * math.cos(theta), r * math.sin(theta)
+
+
+def random_seed() -> int:
+    return random.SystemRandom().getrandbits(63)
+
+
+class SigmaTable(dict):
+    """mass -> sigma of the Brownian force, computed on first lookup."""
+    def __init__(self, temperature, damping_coeff, dt):
+        super().__init__()
+        self.key = (temperature, damping_coeff, dt)
+        self.variance = 2 * damping_coeff * temperature / dt
+
+    def __missing__(self, mass):
+        sigma = self[mass] = math.sqrt(self.variance * mass)
+        return sigma
+
+
+class BrownianNoise:
+    """
+    Noise source of PhysicsEngine. Per step: sigmas() for the force scale of
+    each mass, normal_pair(i) for particle i (in index order), then advance().
+    """
+    def __init__(self, seed: int = None, counter_based: bool = False):
+        self.seed = random_seed() if seed is None else seed
+        self.counter_based = counter_based
+        self.step = 0
+        self.rng = random.Random(self.seed)
+        self._key = step_key(self.seed, 0)
+        self._sigmas = None
+
+    def sigmas(self, temperature, damping_coeff, dt) -> SigmaTable:
+        """sigma per mass class, kept until temperature, damping_coeff or dt change."""
+        if self._sigmas is None or self._sigmas.key != (temperature, damping_coeff, dt):
+            self._sigmas = SigmaTable(temperature, damping_coeff, dt)
+        return self._sigmas
+
+    def normal_pair(self, i: int) -> tuple[float, float]:
+        if self.counter_based:
+            return counter_normals(self._key, i)
+        gauss = self.rng.gauss
+        return gauss(0, 1), gauss(0, 1)
+
+    def advance(self):
+        """Move on to the next step."""
+        self.step += 1
+        self._key = step_key(self.seed, self.step)
+
+    def get_state(self) -> dict:
+        """JSON serializable state, see set_state."""
+        return {"seed": self.seed, "step": self.step, "counter_based": self.counter_based,
+                "random": self.rng.getstate()}
+
+    def set_state(self, state: dict):
+        """
+        Restore a state from get_state. The position in a sequential stream
+        is only restored from a state of the same noise class, otherwise the
+        stream restarts from the seed.
+        """
+        self.seed = state["seed"]
+        self.counter_based = state["counter_based"]
+        self.step = state["step"]
+        self._key = step_key(self.seed, self.step)
+        self.rng = random.Random(self.seed)
+        if "random" in state:
+            version, internal, gauss_next = state["random"]
+            self.rng.setstate((version, tuple(internal), gauss_next))
@@ -0,0 +1,290 @@
+# observables.py
+"""
+Scalar observables of a running engine, sampled every few steps into a ring
+buffer and optionally appended to a file:
+
+    step, time                 step count and simulated time
+    kinetic                    ½·m·v² of the free particles, v from the Verlet history
+    spring_energy              ¼·k·stretch² per intact spring (each end feels ½·k·stretch)
+    bending_energy             ¼·k·(L1 + L2)·Δθ² per bending spring, see xpbd.py
+    temperature                kinetic / free particles (2D, k_B = 1)
+    com_x, com_y               centre of mass
+    pressure                   virial pressure of the box from the kinetic energy, the springs and
+                               the repulsion, only with pressure=True (it costs a pass over the
+                               repulsion pairs) and a boundary that has a size, nan otherwise
+    area:<tag>, perimeter:<tag>
+                               area and length of the outline of the particles with that tag
+
+The outline of a tag is made of the first spring leaving each of its
+particles to another particle of the tag, which is the ring spring for the
+walls, rods and cocci of structures.py. Areas are not meaningful for an
+outline that straddles a periodic edge.
+
+    observables = Observables(physics, every=10, sink=CsvSink("run.csv"))
+    ...
+    observables.column("temperature")  # the buffered samples, oldest first
+    observables.close()
+"""
+import json
+import time
+
+import numpy as np
+
+from bending_set import BendingSet
+from cell_list import grid_pairs
+from spring_set import SpringSet
+from vectorized_exclusions import ArrayExclusions
+from vectorized_physics import VectorizedPhysicsEngine
+
+COLUMNS = ("step", "time", "kinetic", "spring_energy", "bending_energy", "temperature", "com_x", "com_y",
+           "pressure")
+
+BINARY_MAGIC = b"PYLOBS1\n"
+
+
+class CsvSink:
+    """Appends samples to a CSV file, the header is written when the file is new or empty."""
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a")
+        self._columns = None
+
+    def write(self, columns, row):
+        if self._columns is None:
+            self._columns = columns
+            if self._file.tell() == 0:
+                self._file.write(",".join(columns) + "\n")
+        self._file.write(",".join(repr(float(v)) for v in row) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BinarySink:
+    """
+    Appends samples as float64 rows to a binary file that starts with
+    BINARY_MAGIC and one line of JSON with the column names, see read_binary.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "ab")
+        self._columns = None
+
+    def write(self, columns, row):
+        if self._columns is None:
+            self._columns = columns
+            if self._file.tell() == 0:
+                self._file.write(BINARY_MAGIC + json.dumps(list(columns)).encode() + b"\n")
+        self._file.write(np.asarray(row, dtype="<f8").tobytes())
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_binary(path: str):
+    """Column names and the (samples, columns) array of a file written by BinarySink."""
+    with open(path, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"{path} is not an observables file")
+        columns = json.loads(f.readline())
+        data = np.frombuffer(f.read(), dtype="<f8")
+    # a sample cut off by an interrupted run is dropped
+    n = len(data) // len(columns)
+    return columns, data[:n * len(columns)].reshape(n, len(columns))
+
+
+def open_sink(path: str):
+    """CsvSink for a .csv path, BinarySink otherwise."""
+    return CsvSink(path) if path.endswith(".csv") else BinarySink(path)
+
+
+class Observables:
+    """
+    Samples the observables of physics every `every` steps. It adds itself to
+    physics.observers, which the engine calls after each step. The last
+    `capacity` samples stay in a ring buffer; with a sink (CsvSink,
+    BinarySink) every sample is also appended to a file. The tags with an
+    outline are fixed when this is created.
+    """
+    def __init__(self, physics, every: int = 10, capacity: int = 1000, sink=None, pressure: bool = False):
+        self.physics = physics
+        self.every = every
+        self.pressure = pressure
+        self.sink = sink
+        self.time = 0.0
+        # time spent sampling, to compare with the step time
+        self.elapsed = 0.0
+        self._key = self._object_key = None
+        self._exclusions = ArrayExclusions()
+        self.tags = sorted({p.tag for p in physics.particles if p.tag is not None}, key=str)
+        self.columns = COLUMNS + tuple(f"{name}:{tag}" for tag in self.tags for name in ("area", "perimeter"))
+        self._buffer = np.full((capacity, len(self.columns)), np.nan)
+        self._count = 0
+        physics.observers.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return min(self._count, len(self._buffer))
+
+    def __call__(self, physics):
+        self.time += physics.last_dt or 0.0
+        if physics.steps % self.every == 0:
+            self.sample()
+
+    def sample(self) -> dict:
+        """Compute the observables now, store and return them."""
+        start = time.perf_counter()
+        row = self._buffer[self._count % len(self._buffer)]
+        row[:] = self._compute()
+        self._count += 1
+        if self.sink is not None:
+            self.sink.write(self.columns, row)
+        self.elapsed += time.perf_counter() - start
+        return dict(zip(self.columns, row.tolist()))
+
+    def latest(self) -> dict:
+        """The last sample, None before the first one."""
+        if not self._count:
+            return None
+        return dict(zip(self.columns, self._buffer[(self._count - 1) % len(self._buffer)].tolist()))
+
+    def history(self) -> np.ndarray:
+        """The buffered samples as a (samples, columns) array, oldest first."""
+        n = len(self._buffer)
+        if self._count <= n:
+            return self._buffer[:self._count].copy()
+        return np.roll(self._buffer, -(self._count % n), axis=0)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.history()[:, self.columns.index(name)]
+
+    def close(self):
+        """Detach from the engine and close the sink."""
+        if self in self.physics.observers:
+            self.physics.observers.remove(self)
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+    def _arrays(self):
+        # positions, previous positions, masses, fixed flags, spring and bending sets of the engine
+        physics = self.physics
+        if isinstance(physics, VectorizedPhysicsEngine):
+            self._update_topology(physics.spring_set, physics.bending_set, len(physics.pos))
+            return physics.pos, physics.prev_pos, physics.mass, physics.fixed, physics.spring_set, physics.bending_set
+        particles = physics.particles
+        key = (id(particles), len(particles), len(physics.springs), len(physics.bending_springs or []))
+        if key != self._object_key:
+            self._object_key = key
+            index = {id(p): i for i, p in enumerate(particles)}
+            self._spring_set = SpringSet(physics.springs, index)
+            self._bending_set = BendingSet(physics.bending_springs, index)
+        else:
+            self._spring_set.refresh()
+            self._bending_set.refresh()
+        self._update_topology(self._spring_set, self._bending_set, len(particles))
+        pos = np.array([(p.pos.x, p.pos.y) for p in particles], dtype=float).reshape(-1, 2)
+        prev_pos = np.array([(p.prev_pos.x, p.prev_pos.y) for p in particles], dtype=float).reshape(-1, 2)
+        mass = np.array([p.mass for p in particles], dtype=float)
+        fixed = np.array([p.fixed for p in particles], dtype=bool)
+        return pos, prev_pos, mass, fixed, self._spring_set, self._bending_set
+
+    def _update_topology(self, spring_set, bending_set, n):
+        # tag code of every particle (-1 for untracked tags) and the outline springs
+        key = (id(spring_set), id(bending_set), n)
+        if key == self._key:
+            return
+        self._key = key
+        codes = {tag: c for c, tag in enumerate(self.tags)}
+        self._tag_codes = np.array([codes.get(p.tag, -1) for p in self.physics.particles], dtype=np.int64)
+        p1, p2 = spring_set.p1, spring_set.p2
+        candidates = np.flatnonzero((self._tag_codes[p1] >= 0) & (self._tag_codes[p1] == self._tag_codes[p2]))
+        _, first = np.unique(p1[candidates], return_index=True)
+        self._outline = candidates[first]
+
+    def _compute(self) -> list:
+        physics = self.physics
+        pos, prev_pos, mass, fixed, ss, bs = self._arrays()
+        wrap = physics.boundary.wrap if physics.boundary.periodic else None
+        free = ~fixed
+        n_free = int(np.count_nonzero(free))
+        dt = physics.last_dt
+        if dt:
+            vel = (pos[free] - prev_pos[free]) / dt
+            kinetic = 0.5 * float(np.sum(mass[free] * (vel[:, 0] ** 2 + vel[:, 1] ** 2)))
+        else:
+            kinetic = 0.0
+        temperature = kinetic / n_free if n_free else 0.0
+        total_mass = float(mass.sum())
+        com = (mass[:, None] * pos).sum(axis=0) / total_mass if total_mass > 0 else np.full(2, np.nan)
+
+        # springs: energy and virial r·F of the force on p2
+        virial = 0.0
+        spring_energy = 0.0
+        if len(ss):
+            delta = pos[ss.p2] - pos[ss.p1]
+            if wrap is not None:
+                delta = wrap(delta)
+            dist = np.hypot(delta[:, 0], delta[:, 1])
+            stretch = np.where(ss.broken, 0.0, dist - ss.rest_length)
+            spring_energy = 0.25 * float(np.sum(ss.stiffness * stretch ** 2))
+            virial -= 0.5 * float(np.sum(ss.stiffness * stretch * dist))
+
+        bending_energy = 0.0
+        if len(bs):
+            theta, _, _, l1, l2 = bs.angles(pos, wrap)
+            d_theta = theta - bs.rest_angle
+            nu = bs.n_unsigned
+            d_theta[nu:] = (d_theta[nu:] + np.pi) % (2 * np.pi) - np.pi
+            bending_energy = 0.25 * float(np.nansum(bs.stiffness * (l1 + l2) * d_theta ** 2))
+
+        pressure = np.nan
+        size = getattr(physics.boundary, "size", None)
+        if self.pressure and size is not None:
+            virial += self._repulsion_virial(pos, ss, bs, wrap)
+            pressure = (kinetic + 0.5 * virial) / (size[0] * size[1])
+
+        row = [physics.steps, self.time, kinetic, spring_energy, bending_energy, temperature, com[0], com[1],
+               pressure]
+        if self.tags:
+            o = self._outline
+            a = pos[ss.p1[o]]
+            d = pos[ss.p2[o]] - a
+            if wrap is not None:
+                d = wrap(d)
+            codes = self._tag_codes[ss.p1[o]]
+            k = len(self.tags)
+            area = 0.5 * np.abs(np.bincount(codes, weights=a[:, 0] * d[:, 1] - a[:, 1] * d[:, 0], minlength=k))
+            perimeter = np.bincount(codes, weights=np.hypot(d[:, 0], d[:, 1]), minlength=k)
+            row.extend(np.column_stack((area, perimeter)).ravel().tolist())
+        return row
+
+    def _repulsion_virial(self, pos, ss, bs, wrap) -> float:
+        physics = self.physics
+        r = physics.repulsion_radius
+        if r <= 0 or len(pos) < 2:
+            return 0.0
+        i, j = grid_pairs(pos, r, physics.boundary.size if physics.boundary.periodic else None)
+        delta = pos[j] - pos[i]
+        if wrap is not None:
+            delta = wrap(delta)
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        hit = (dist > 0) & (dist < r)
+        i, j, dist = i[hit], j[hit], dist[hit]
+        excl = self._exclusions
+        excl.bonded, excl.same_tag = physics.exclusions.bonded, physics.exclusions.same_tag
+        if excl.active:
+            excl.update(physics.particles, ss, bs)
+            dist = dist[~excl.mask(i, j)]
+        return float(np.sum(physics.repulsion_strength * (r - dist) * dist / r))
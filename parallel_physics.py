@@ -0,0 +1,471 @@
+# parallel_physics.py
+"""
+VectorizedPhysicsEngine that spreads every step over worker processes by
+domain decomposition. The box is cut into slabs along its longer axis that
+hold the same number of particles each, and every worker owns the particles
+of one slab. The particle and spring arrays live in shared memory, so a
+worker reads all positions directly; it computes the forces on the particles
+it owns from these and from a halo around its slab (every particle within
+repulsion_radius + halo_skin of it, plus the other ends of all springs and
+bending springs of its own particles), then integrates its own particles.
+Forces are only ever written to owned rows, so no two workers write the same
+memory, and springs that cross a slab border are evaluated by both sides.
+
+Domains are rebuilt when some particle moved more than halo_skin / 2 since
+the last rebuild, and after particles or springs were added. The Brownian
+forces come from the counter based stream (noise.counter_normals), so the
+random numbers do not depend on how the particles are split up.
+"""
+import multiprocessing
+import os
+import time
+import traceback
+import weakref
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from vectorized_physics import VectorizedPhysicsEngine
+from vectorized_noise import ArrayBrownianNoise
+from spring_set import SpringSet
+from bending_set import BendingSet
+from cell_list import grid_pairs, ArrayNeighbourList
+from array_utils import scatter_add
+
+# blocks that could not be closed yet because arrays still pointed into them
+_retired = []
+
+
+def _release(blocks):
+    blocks = _retired + blocks
+    _retired.clear()
+    for shm in blocks:
+        try:
+            shm.close()
+        except BufferError:
+            _retired.append(shm)
+            continue
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedArrays:
+    """Named numpy arrays in shared memory blocks, released with the object."""
+    def __init__(self):
+        self.blocks = []
+        self.arrays = {}
+        self._finalizer = weakref.finalize(self, _release, self.blocks)
+
+    def add(self, name: str, array: np.ndarray) -> np.ndarray:
+        """Copy array into a new block, returns the shared copy."""
+        shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.blocks.append(shm)
+        shared = np.ndarray(array.shape, array.dtype, buffer=shm.buf)
+        shared[...] = array
+        self.arrays[name] = shared
+        return shared
+
+    def spec(self) -> dict:
+        """What a worker needs to attach: name -> (block name, shape, dtype)."""
+        return {name: (shm.name, a.shape, a.dtype.str) for shm, (name, a) in zip(self.blocks, self.arrays.items())}
+
+    def release(self):
+        self.arrays.clear()
+        self._finalizer()
+
+
+class _Worker:
+    """State of one worker process, each method is a command the engine sends."""
+    def __init__(self, index: int):
+        self.index = index
+        self.blocks = []
+        self.a = {}
+        self.noise = ArrayBrownianNoise(0, counter_based=True)
+        self.neighbours = ArrayNeighbourList()
+        self.exclusions = None
+        self.owned = None
+
+    def attach(self, spec: dict, n_unsigned: int):
+        self.detach()
+        for name, (block, shape, dtype) in spec.items():
+            shm = SharedMemory(block)
+            self.blocks.append(shm)
+            self.a[name] = np.ndarray(shape, dtype, buffer=shm.buf)
+        self.n_unsigned = n_unsigned
+
+    def detach(self):
+        self.a = {}
+        self.owned = None
+        for shm in self.blocks:
+            shm.close()
+        self.blocks = []
+
+    def set_exclusions(self, exclusions):
+        self.exclusions = exclusions
+
+    def domain(self, cuts, axis: int, width: float, box):
+        """Take the particles between cuts[index - 1] and cuts[index] along axis, plus their halo."""
+        a = self.a
+        pos = a["pos"]
+        x = pos[:, axis]
+        k = self.index
+        own = np.searchsorted(cuts, x, side="right") == k
+        if box is None:
+            lo = cuts[k - 1] if k > 0 else -np.inf
+            hi = cuts[k] if k < len(cuts) else np.inf
+            with np.errstate(invalid="ignore"):
+                dist = np.maximum(lo - x, x - hi)
+        else:
+            length = box[axis]
+            lo = cuts[k - 1] if k > 0 else 0.0
+            hi = cuts[k] if k < len(cuts) else length
+            dist = np.minimum((lo - x) % length, (x - hi) % length)
+        with np.errstate(invalid="ignore"):
+            near = dist < width
+        sp1, sp2 = a["spring_p1"], a["spring_p2"]
+        spring_mask = own[sp1] | own[sp2]
+        near[sp1[spring_mask]] = True
+        near[sp2[spring_mask]] = True
+        bp1, bp2, bp3 = a["bending_p1"], a["bending_p2"], a["bending_p3"]
+        bending_mask = own[bp1] | own[bp2] | own[bp3]
+        for p in (bp1, bp2, bp3):
+            near[p[bending_mask]] = True
+        owned = np.flatnonzero(own)
+        local = np.concatenate((owned, np.flatnonzero(near & ~own)))
+        # global -> local row
+        g2l = np.full(len(pos), -1, dtype=np.int64)
+        g2l[local] = np.arange(len(local))
+        self.spring_k = np.flatnonzero(spring_mask)
+        self.spring_ends = g2l[sp1[self.spring_k]], g2l[sp2[self.spring_k]]
+        self.bending_k = np.flatnonzero(bending_mask)
+        self.bending_ends = tuple(g2l[p[self.bending_k]] for p in (bp1, bp2, bp3))
+        self.bending_unsigned = int(np.count_nonzero(self.bending_k < self.n_unsigned))
+        self.owned, self.local = owned, local
+        self.ref = pos[local]
+        self.mass = None
+        self.neighbours.invalidate()
+        return len(owned), len(local) - len(owned)
+
+    def _moved(self, pos, limit, boundary) -> bool:
+        d = pos - self.ref
+        if boundary.periodic:
+            d = boundary.wrap(d)
+        return bool(np.max(d[:, 0] ** 2 + d[:, 1] ** 2, initial=0.0) > limit * limit)
+
+    def forces(self, p: dict):
+        """
+        Accelerations of the owned particles, kept until integrate. Returns the
+        springs that broke and the pairs tested, or None if the domain is stale.
+        """
+        if self.owned is None:
+            return None
+        a = self.a
+        boundary = p["boundary"]
+        owned, local = self.owned, self.local
+        n_owned = len(owned)
+        pos = a["pos"][local]
+        if self._moved(pos, p["halo_skin"] / 2, boundary):
+            return None
+        wrap = boundary.wrap if boundary.periodic else None
+        f = np.zeros_like(pos)
+
+        k = self.spring_k
+        springs = SpringSet.from_arrays(*self.spring_ends, a["spring_rest_length"][k], a["spring_stiffness"][k],
+                                        a["spring_max_force"][k], a["spring_broken"][k])
+        intact = ~springs.broken
+        springs.apply(pos, f, wrap)
+        snapped = k[springs.broken & intact]
+        k = self.bending_k
+        BendingSet.from_arrays(*self.bending_ends, self.bending_unsigned, a["bending_rest_angle"][k],
+                               a["bending_stiffness"][k]).apply(pos, f, wrap)
+
+        r = p["repulsion_radius"]
+        pair_tests = 0
+        if r > 0 and len(pos) >= 2:
+            if p["neighbour_skin"] > 0:
+                i, j = self.neighbours.update(pos, r, p["neighbour_skin"], boundary)
+            else:
+                i, j = grid_pairs(pos, r, boundary.size if boundary.periodic else None)
+            keep = (i < n_owned) | (j < n_owned)
+            if self.exclusions is not None:
+                keep &= ~self.exclusions.mask(local[i], local[j])
+            i, j = i[keep], j[keep]
+            # a pair shared with another domain is counted by the owner of its lower index
+            pair_tests = int(np.count_nonzero(np.where(local[i] < local[j], i < n_owned, j < n_owned)))
+            delta = pos[j] - pos[i]
+            if wrap is not None:
+                delta = wrap(delta)
+            dist = np.hypot(delta[:, 0], delta[:, 1])
+            hit = (dist > 0) & (dist < r)
+            i, j, delta, dist = i[hit], j[hit], delta[hit], dist[hit]
+            force = delta * (p["repulsion_strength"] * (r - dist) / (r * dist))[:, None]
+            scatter_add(f, j, force)
+            scatter_add(f, i, -force)
+
+        fixed = a["fixed"][owned]
+        free = ~fixed
+        mass = a["mass"][owned]
+        if self.mass is None or not np.array_equal(mass, self.mass):
+            self.mass = mass
+        acc = f[:n_owned] * np.where(fixed, 0.0, 1.0 / self.mass)[:, None]
+        acc[free] += p["gravity"]
+        dt = p["dt"]
+        gamma = p["damping_coeff"]
+        acc[free] -= gamma * (pos[:n_owned][free] - a["prev_pos"][owned[free]]) / dt
+        noise = self.noise
+        if noise.seed != p["seed"] or noise.step != p["step"]:
+            # first step, or the engine's stream was reseeded or restored; integrate advances it
+            noise.set_state({"seed": p["seed"], "step": p["step"], "counter_based": True})
+        scale = self.noise.accel_scale(self.mass, p["temperature"], gamma, dt)[free]
+        acc[free] += self.noise.normals(owned[free]) * scale[:, None]
+        self.acc = acc
+        return snapped, pair_tests
+
+    def integrate(self, dt: float, damping: float, boundary):
+        """Verlet step and boundary for the owned particles, with the accelerations of forces."""
+        a = self.a
+        owned = self.owned
+        free = ~a["fixed"][owned]
+        pos = a["pos"][owned]
+        prev_pos = a["prev_pos"][owned]
+        acc = a["acc"][owned] + self.acc
+        moved = pos[free] + (pos[free] - prev_pos[free]) * damping + acc[free] * dt * dt
+        prev_pos[free] = pos[free]
+        pos[free] = moved
+        boundary.apply_arrays(pos, prev_pos)
+        a["pos"][owned] = pos
+        a["prev_pos"][owned] = prev_pos
+        a["acc"][owned] = 0
+        self.noise.advance()
+
+
+def _worker_main(index: int, conn):
+    worker = _Worker(index)
+    while True:
+        command, args = conn.recv()
+        if command == "stop":
+            break
+        try:
+            conn.send((True, getattr(worker, command)(*args)))
+        except Exception:
+            conn.send((False, traceback.format_exc()))
+    worker.detach()
+
+
+class _Pool:
+    """The worker processes and their pipes."""
+    def __init__(self, n: int):
+        ctx = multiprocessing.get_context()
+        self.conns = []
+        self.processes = []
+        for k in range(n):
+            conn, child = ctx.Pipe()
+            process = ctx.Process(target=_worker_main, args=(k, child), daemon=True)
+            process.start()
+            self.conns.append(conn)
+            self.processes.append(process)
+
+    def broadcast(self, command: str, *args) -> list:
+        """Run command on every worker, returns their results."""
+        for conn in self.conns:
+            conn.send((command, args))
+        results = []
+        for conn in self.conns:
+            ok, result = conn.recv()
+            if not ok:
+                raise RuntimeError(f"worker failed in {command}:\n{result}")
+            results.append(result)
+        return results
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(("stop", ()))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+        self.conns, self.processes = [], []
+
+
+class ParallelPhysicsEngine(VectorizedPhysicsEngine):
+    """
+    VectorizedPhysicsEngine run by workers (default: one per core) on
+    domains of the box, see the module docstring. Same arguments plus
+    workers and halo_skin, only with the force solver and without
+    respa_substeps; call close() (or use it as a context manager) to stop
+    the worker processes.
+
+    The positions are not written back to the Particle objects after each
+    step: call sync() before reading or editing the objects (FixedStepper
+    does so once per frame, for rendering).
+    """
+    sync_every_step = False
+    # the workers run all phases of a step together, see _update_profiled
+    profiled_phases = ("forces", "integrate")
+    def __init__(self, particles, springs, bending_springs=None, gravity=(0, 0), repulsion_radius=20,
+                 repulsion_strength=100, temperature=1.0, damping_coeff=1.0, seed=None, boundary=None,
+                 neighbour_skin=0, exclude_bonded=0, exclude_same_tag=False, solver="force", xpbd_iterations=8,
+                 adaptive_dt=None, respa_substeps=1, workers: int = None, halo_skin: float = 10):
+        if solver != "force":
+            raise ValueError("ParallelPhysicsEngine only supports solver='force'")
+        if respa_substeps != 1:
+            raise ValueError("ParallelPhysicsEngine does not support respa_substeps")
+        self.workers = workers or os.cpu_count()
+        self.halo_skin = halo_skin
+        # how often the particles were split into domains
+        self.domain_rebuilds = 0
+        self._pool = None
+        self._shared = None
+        super().__init__(particles, springs, bending_springs, gravity=gravity, repulsion_radius=repulsion_radius,
+                         repulsion_strength=repulsion_strength, temperature=temperature, damping_coeff=damping_coeff,
+                         seed=seed, boundary=boundary, neighbour_skin=neighbour_skin, exclude_bonded=exclude_bonded,
+                         exclude_same_tag=exclude_same_tag, adaptive_dt=adaptive_dt)
+        self.noise.counter_based = True
+
+    def rebuild(self):
+        super().rebuild()
+        self._share()
+
+    def _share(self):
+        # move the state and spring arrays into new shared memory, the workers attach before the next step
+        old = self._shared
+        shared = SharedArrays()
+        for name in ("pos", "prev_pos", "acc", "mass"):
+            setattr(self, name, shared.add(name, getattr(self, name)))
+        self.fixed = shared.add("fixed", self.fixed)
+        ss = self.spring_set
+        for name in ("p1", "p2", "rest_length", "stiffness", "max_force", "broken"):
+            setattr(ss, name, shared.add("spring_" + name, getattr(ss, name)))
+        bs = self.bending_set
+        for name in ("p1", "p2", "p3", "rest_angle", "stiffness"):
+            setattr(bs, name, shared.add("bending_" + name, getattr(bs, name)))
+        self._shared = shared
+        self.noise.invalidate()
+        self.spatial_index.invalidate()
+        self._attached = False
+        if old is not None:
+            old.release()
+
+    def springs_changed(self):
+        super().springs_changed()
+        self._share()
+
+    def begin_step(self):
+        shared, sets = self._shared, (self.spring_set, self.bending_set)
+        super().begin_step()
+        if self._shared is shared and (sets[0] is not self.spring_set or sets[1] is not self.bending_set):
+            self._share()
+
+    def close(self):
+        """Stop the workers and free the shared memory."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _ready(self) -> _Pool:
+        # started and attached workers
+        if self._pool is None:
+            self._pool = _Pool(self.workers)
+            weakref.finalize(self, self._pool.close)
+            self._attached = False
+        if not self._attached:
+            self._pool.broadcast("attach", self._shared.spec(), self.bending_set.n_unsigned)
+            self._attached = True
+            self._domains = None
+            self._sent_exclusions = None
+        return self._pool
+
+    def _build_domains(self, pool: _Pool):
+        pos = self.pos
+        finite = pos[np.isfinite(pos).all(axis=1)]
+        if self.boundary.periodic:
+            axis = int(np.argmax(self.boundary.size))
+        elif len(finite):
+            axis = int(np.argmax(finite.max(axis=0) - finite.min(axis=0)))
+        else:
+            axis = 0
+        n = len(pool.conns)
+        # equal particle counts per slab
+        cuts = np.quantile(finite[:, axis], np.arange(1, n) / n) if len(finite) else np.zeros(n - 1)
+        width = max(self.repulsion_radius, 0) + self.halo_skin
+        self._domains = pool.broadcast("domain", cuts, axis, width,
+                                       self.boundary.size if self.boundary.periodic else None)
+        self.domain_rebuilds += 1
+
+    def step(self, dt):
+        if self.stats is not None:
+            self._update_profiled(dt)
+            return
+        self.begin_step()
+        self._set_dt(dt)
+        self._forces(dt)
+        self._integrate(dt)
+        self.end_step()
+        self.steps += 1
+        for observer in self.observers:
+            observer(self)
+
+    def _update_profiled(self, dt):
+        # the phases run together in the workers: everything up to the accelerations is timed
+        # as forces, the Verlet step and the boundary as integrate
+        step_start = time.perf_counter()
+        self.begin_step()
+        self._set_dt(dt)
+        broken_before = self.count_broken_springs()
+        rebuilds_before = self.domain_rebuilds
+        times = {}
+        # allocation peaks only cover the main process, not the workers
+        self._run_phase(times, "forces", self._forces, dt)
+        self._run_phase(times, "integrate", self._integrate, dt)
+        self.end_step()
+        self.steps += 1
+        self.stats.record(times, time.perf_counter() - step_start, self.count_pair_tests(),
+                          self.count_broken_springs() - broken_before, self.domain_rebuilds - rebuilds_before, dt)
+        for observer in self.observers:
+            observer(self)
+
+    def _forces(self, dt):
+        pool = self._ready()
+        excl = self._exclusions()
+        version = excl.version if excl is not None else None
+        if version != self._sent_exclusions:
+            pool.broadcast("set_exclusions", excl)
+            self._sent_exclusions = version
+        params = {
+            "gravity": (self.gravity.x, self.gravity.y), "repulsion_radius": self.repulsion_radius,
+            "repulsion_strength": self.repulsion_strength, "temperature": self.temperature,
+            "damping_coeff": self.damping_coeff, "neighbour_skin": self.neighbour_skin, "halo_skin": self.halo_skin,
+            "boundary": self.boundary, "dt": dt, "seed": self.noise.seed, "step": self.noise.step,
+        }
+        for _ in range(2):
+            if self._domains is None:
+                self._build_domains(pool)
+            results = pool.broadcast("forces", params)
+            if all(result is not None for result in results):
+                break
+            # some particle left the halo it was seen in
+            self._domains = None
+        else:
+            raise RuntimeError("domains are stale right after they were built")
+        snapped = np.unique(np.concatenate([s for s, _ in results]))
+        self._pair_tests = sum(n for _, n in results)
+        if len(snapped):
+            self.spring_set.broken[snapped] = True
+            for k in snapped.tolist():
+                self.springs[k].broken = True
+
+    def _integrate(self, dt, damping=0.98):
+        self._pool.broadcast("integrate", dt, damping, self.boundary)
+        self.noise.advance()
+
+    def count_neighbour_rebuilds(self) -> int:
+        return self.domain_rebuilds
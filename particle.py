@@ -1,27 +1,55 @@
 # particle.py
-import pygame
+from vector import Vec2
 
 class Particle:
+    # no per-instance __dict__: less memory per particle, and a typo like
+    # p.fxied = True raises instead of silently adding an attribute
+    __slots__ = ("pos", "prev_pos", "acc", "mass", "_fixed", "color", "radius", "tag")
+
+    # bumped whenever any particle is fixed or freed, so the array engines can
+    # tell that the flags changed without scanning them
+    fixed_changes = 0
+
     def __init__(self, position, mass=1.0, color=None, radius=None, tag=None):
-        self.pos = pygame.Vector2(position)
+        self.pos = Vec2(position)
         self.prev_pos = self.pos.copy()
-        self.acc = pygame.Vector2(0, 0)
+        self.acc = Vec2(0, 0)
         self.mass = mass
-        self.fixed = False
+        self._fixed = False
         self.color = color
         self.radius = radius
         self.tag = tag
 
+    @property
+    def fixed(self) -> bool:
+        return self._fixed
+
+    @fixed.setter
+    def fixed(self, value):
+        value = bool(value)
+        if value != self._fixed:
+            self._fixed = value
+            Particle.fixed_changes += 1
+
     def apply_force(self, force):
-        if not self.fixed:
-            self.acc += force / self.mass
+        if not self._fixed:
+            self.acc.x += force.x / self.mass
+            self.acc.y += force.y / self.mass
+
+    def apply_force_xy(self, fx, fy):
+        # same as apply_force for a force given by its components
+        if not self._fixed:
+            self.acc.x += fx / self.mass
+            self.acc.y += fy / self.mass
 
     def integrate(self, dt, damping=0.98):
-        if self.fixed:
+        if self._fixed:
             return
-        # Verlet integration
-        velocity = (self.pos - self.prev_pos) * damping
-        new_pos = self.pos + velocity + self.acc * dt * dt
-        self.prev_pos = self.pos.copy()
-        self.pos = new_pos
-        self.acc = pygame.Vector2(0, 0)
+        # Verlet integration, in place so that a step allocates no vectors
+        pos, prev_pos, acc = self.pos, self.prev_pos, self.acc
+        x, y = pos.x, pos.y
+        pos.x = x + (x - prev_pos.x) * damping + acc.x * dt * dt
+        pos.y = y + (y - prev_pos.y) * damping + acc.y * dt * dt
+        prev_pos.x = x
+        prev_pos.y = y
+        acc.x = acc.y = 0.0
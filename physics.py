@@ -1,64 +1,446 @@
 # physics.py
-import pygame
+from vector import Vec2
 from particle import Particle
 from spring import Spring
 from bending_spring import BendingSpring
-import random
+from spatial_hash import SpatialHash
+from profiling import StepStats
+from noise import BrownianNoise
+from boundaries import Boundary
+from neighbour_list import NeighbourList
+from exclusions import Exclusions
+from spatial_index import SpatialIndex
+import xpbd
 import math
+import time
+import tracemalloc
+
+# the phases of one step in the order update() runs them, each as
+# (name, function(engine, dt)); used by benchmarks and profiling
+PHASES = (
+    ("gravity", lambda engine, dt: engine.apply_gravity()),
+    ("springs", lambda engine, dt: engine.apply_springs()),
+    ("bending", lambda engine, dt: engine.apply_bending()),
+    ("repulsion", lambda engine, dt: engine.apply_repulsion()),
+    ("drag", lambda engine, dt: engine.apply_drag(dt)),
+    ("integrate", lambda engine, dt: engine.integrate(dt)),
+    ("constraints", lambda engine, dt: engine.solve_constraints(dt)),
+    ("boundary", lambda engine, dt: engine.apply_boundary()),
+)
+
+
+def check_adaptive_dt(adaptive_dt):
+    """adaptive_dt as a (dt_min, dt_max) tuple, raises ValueError unless 0 < dt_min <= dt_max."""
+    if adaptive_dt is None:
+        return None
+    dt_min, dt_max = adaptive_dt
+    if not 0 < dt_min <= dt_max:
+        raise ValueError(f"adaptive_dt needs 0 < dt_min <= dt_max, got {tuple(adaptive_dt)}")
+    return float(dt_min), float(dt_max)
+
 
 class PhysicsEngine:
+    noise_class = BrownianNoise
+    neighbour_list_class = NeighbourList
+    exclusions_class = Exclusions
+    spatial_index_class = SpatialIndex
+    # phases timed by enable_profiling
+    profiled_phases = tuple(name for name, _ in PHASES)
+
     def __init__(self, particles: list[Particle], springs: list[Spring], bending_springs: list[BendingSpring]=None, gravity=(0, 0), repulsion_radius=20,
-                 repulsion_strength=100, temperature=1.0, damping_coeff=1.0):
+                 repulsion_strength=100, temperature=1.0, damping_coeff=1.0, seed=None, boundary: Boundary = None,
+                 neighbour_skin=0, exclude_bonded=0, exclude_same_tag=False, solver="force", xpbd_iterations=8,
+                 adaptive_dt=None, respa_substeps=1):
+        if solver not in ("force", "xpbd"):
+            raise ValueError(f"unknown solver {solver!r}")
         self.particles = particles
         self.springs = springs
         self.bending_springs = bending_springs
-        self.gravity = pygame.Vector2(gravity)
+        self.gravity = Vec2(gravity)
         self.repulsion_radius = repulsion_radius
         self.repulsion_strength = repulsion_strength
         self.temperature = temperature
         self.damping_coeff = damping_coeff
+        # source of the Brownian forces, a seed makes runs reproducible
+        self.noise = self.noise_class(seed)
+        # boundary conditions, see boundaries.py; None is an open domain
+        self.boundary = boundary or Boundary()
+        # broadphase for the repulsion, cell size follows repulsion_radius
+        self.grid = SpatialHash(repulsion_radius)
+        # with a skin > 0 the repulsion pairs come from a Verlet neighbour list
+        # that is only rebuilt when particles moved more than skin / 2
+        self.neighbour_skin = neighbour_skin
+        self.neighbours = self.neighbour_list_class()
+        # pairs left out of the repulsion: 1-2 (exclude_bonded=1) or also 1-3
+        # (exclude_bonded=2) neighbours along springs, and/or pairs with the same tag
+        self.exclusions = self.exclusions_class(exclude_bonded, exclude_same_tag)
+        # index for nearest/within_radius/within_box, rebuilt by the first query after a step
+        self.spatial_index = self.spatial_index_class()
+        # number of steps run so far
+        self.steps = 0
+        # "force": springs and bending springs are forces, "xpbd": position
+        # constraints solved after integrate with xpbd_iterations sweeps, see xpbd.py
+        self.solver = solver
+        self.xpbd_iterations = xpbd_iterations
+        # None: update(dt) is one step of dt. (dt_min, dt_max): update(dt)
+        # advances the time by dt in steps of stable_dt() clamped to these
+        # bounds, several small ones or one large one every few calls
+        self.adaptive_dt = check_adaptive_dt(adaptive_dt)
+        # time passed to update but not simulated yet, in adaptive mode
+        self.time_debt = 0.0
+        # dt of the last step
+        self.last_dt = None
+        # > 1: multiple time stepping (RESPA), gravity, repulsion and drag are
+        # evaluated once per step of dt and the springs and bending springs in
+        # respa_substeps inner steps of dt / respa_substeps, see _step_respa
+        self.respa_substeps = respa_substeps
+        # StepStats while profiling is enabled, None otherwise
+        self.stats = None
+        # callables observer(engine) run after every step, e.g. observables.Observables
+        self.observers = []
+
+    def springs_changed(self):
+        """
+        Call after editing Spring objects (stiffness, rest length, ...) from outside.
+        This engine reads them on every step, so there is nothing to do here.
+        """
+
+    def begin_step(self):
+        """Hook run before the phases of a step."""
+
+    def end_step(self):
+        """Hook run after the phases of a step."""
+
+    def sync(self):
+        """
+        Bring the Particle objects up to date with the state of the engine.
+        This engine steps the objects themselves, so there is nothing to do here.
+        """
+
+    def enable_profiling(self, memory: bool = False) -> StepStats:
+        """
+        Start recording per-phase timings and counters, returns the stats object
+        that is filled. memory=True also records the allocation peak of every
+        phase with tracemalloc (started here if it is not tracing yet), which
+        makes the steps considerably slower.
+        """
+        if self.stats is None or self.stats.memory != memory:
+            self.disable_profiling()
+            self.stats = StepStats(self.profiled_phases, memory)
+            if memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.stats.started_tracing = True
+        return self.stats
+
+    def disable_profiling(self):
+        if self.stats is not None and self.stats.started_tracing:
+            tracemalloc.stop()
+        self.stats = None
+
+    def positions(self):
+        """Current particle positions as a sequence of (x, y)."""
+        return [(p.pos.x, p.pos.y) for p in self.particles]
+
+    def broken_flags(self):
+        """broken flag of every spring, in the order of self.springs."""
+        return [s.broken for s in self.springs]
+
+    def count_broken_springs(self) -> int:
+        return sum(1 for s in self.springs if s.broken)
+
+    def count_pair_tests(self) -> int:
+        """Candidate pairs examined by the last repulsion phase."""
+        if self.repulsion_radius <= 0:
+            return 0
+        if self.neighbour_skin > 0:
+            return len(self.neighbours.pairs)
+        return self.grid.pair_count()
+
+    def count_neighbour_rebuilds(self) -> int:
+        """How often the neighbour list was rebuilt so far."""
+        return self.neighbours.rebuilds
 
     def update(self, dt):
-        # apply gravity
+        """Advance the simulation by dt, see adaptive_dt."""
+        if self.adaptive_dt is None:
+            self.step(dt)
+            return
+        dt_min, dt_max = self.adaptive_dt
+        self.time_debt += dt
+        while True:
+            h = min(max(self.stable_dt(), dt_min), dt_max)
+            if self.time_debt < h:
+                break
+            self.step(h)
+            self.time_debt -= h
+
+    def stable_dt(self, safety: float = 0.5) -> float:
+        """
+        Estimate of the largest step that keeps the explicit integration
+        stable: safety times 2 / ω for the fastest oscillation of a spring,
+        bending spring or repulsion contact (ω² = stiffness / mass) and for
+        the drag, and no free particle moving more than a tenth of the
+        repulsion radius per step at its current speed. Springs and bending
+        springs do not limit it with solver="xpbd" and limit only the inner
+        step with respa_substeps.
+        """
+        bonded_omega2 = omega2 = 0.0
+        max_inv_mass = max((1 / p.mass for p in self.particles if not p.fixed), default=0.0)
+        if self.solver == "force":
+            for s in self.springs:
+                if not s.broken:
+                    w = (0.0 if s.p1.fixed else 1 / s.p1.mass) + (0.0 if s.p2.fixed else 1 / s.p2.mass)
+                    bonded_omega2 = max(bonded_omega2, 0.5 * s.stiffness * w)
+            wrap = self._wrap()
+            for bs in self.bending_springs or []:
+                v1, v2 = bs.edges(wrap)
+                l1, l2 = v1.length(), v2.length()
+                if l1 > 0 and l2 > 0:
+                    w1, w2, w3 = ((0.0 if p.fixed else 1 / p.mass) for p in (bs.p1, bs.p2, bs.p3))
+                    bonded_omega2 = max(bonded_omega2, bs.stiffness * (w1 / l1 + w3 / l2 + w2 * (1 / l1 + 1 / l2)))
+        if self.repulsion_radius > 0:
+            omega2 = max(omega2, 2 * self.repulsion_strength / self.repulsion_radius * max_inv_mass)
+        dt = math.inf
+        if bonded_omega2 > 0:
+            dt = safety * 2 / math.sqrt(bonded_omega2) * self.respa_substeps
+        if omega2 > 0:
+            dt = min(dt, safety * 2 / math.sqrt(omega2))
+        if self.damping_coeff > 0:
+            dt = min(dt, safety * 2 / self.damping_coeff)
+        if self.last_dt and self.repulsion_radius > 0:
+            speed = max((math.hypot(p.pos.x - p.prev_pos.x, p.pos.y - p.prev_pos.y)
+                         for p in self.particles if not p.fixed), default=0.0) / self.last_dt
+            if speed > 0:
+                dt = min(dt, 0.1 * self.repulsion_radius / speed)
+        return dt
+
+    def _set_dt(self, dt):
+        # in adaptive mode the Verlet history, which holds the displacement of
+        # the last step, is rescaled to keep the velocity it stands for when the
+        # step size changes; fixed-dt callers that vary dt keep the plain Verlet
+        # behaviour
+        if self.adaptive_dt is not None and self.last_dt is not None and dt != self.last_dt:
+            self.rescale_history(dt / self.last_dt)
+        self.last_dt = dt
+
+    def rescale_history(self, ratio: float):
+        """Scale the displacement pos - prev_pos of all free particles by ratio."""
         for p in self.particles:
-            p.apply_force(self.gravity * p.mass)
+            if not p.fixed:
+                p.prev_pos.x = p.pos.x - (p.pos.x - p.prev_pos.x) * ratio
+                p.prev_pos.y = p.pos.y - (p.pos.y - p.prev_pos.y) * ratio
 
-        # apply spring forces
+    def step(self, dt):
+        """One step of dt."""
+        if self.stats is not None:
+            self._update_profiled(dt)
+            return
+        self.begin_step()
+        self._set_dt(dt)
+        if self.respa_substeps > 1:
+            self._step_respa(dt)
+        else:
+            self.apply_gravity()
+            self.apply_springs()
+            self.apply_bending()
+            self.apply_repulsion()
+            self.apply_drag(dt)
+            self.integrate(dt)
+            self.solve_constraints(dt)
+            self.apply_boundary()
+        self.end_step()
+        self.steps += 1
+        for observer in self.observers:
+            observer(self)
+
+    def _update_profiled(self, dt):
+        # same as update, with every phase timed
+        step_start = time.perf_counter()
+        self.begin_step()
+        self._set_dt(dt)
+        broken_before = self.count_broken_springs()
+        rebuilds_before = self.count_neighbour_rebuilds()
+        times = {}
+        if self.respa_substeps > 1:
+            self._step_respa(dt, times)
+        else:
+            for name, phase in PHASES:
+                self._run_phase(times, name, phase, self, dt)
+        self.end_step()
+        self.steps += 1
+        step_time = time.perf_counter() - step_start
+        self.stats.record(times, step_time, self.count_pair_tests(), self.count_broken_springs() - broken_before,
+                          self.count_neighbour_rebuilds() - rebuilds_before, dt)
+        for observer in self.observers:
+            observer(self)
+
+    def _step_respa(self, dt, times=None):
+        # the slow forces are computed once and held over the inner steps, with
+        # the Verlet history rescaled to the inner step and back; the damping
+        # per inner step gives the same 0.98 per step of dt
+        n = self.respa_substeps
+        h = dt / n
+        damping = 0.98 ** (1 / n)
+        run = self._run_phase
+        run(times, "gravity", self.apply_gravity)
+        run(times, "repulsion", self.apply_repulsion)
+        run(times, "drag", self.apply_drag, dt)
+        slow = self._acc_copy()
+        self.rescale_history(1 / n)
+        for k in range(n):
+            if k > 0:
+                self._add_acc(slow)
+            run(times, "springs", self.apply_springs)
+            run(times, "bending", self.apply_bending)
+            run(times, "integrate", self.integrate, h, damping)
+            if k < n - 1:
+                run(times, "boundary", self.apply_boundary)
+        self.rescale_history(n)
+        run(times, "constraints", self.solve_constraints, dt)
+        run(times, "boundary", self.apply_boundary)
+
+    def _run_phase(self, times, name, phase, *args):
+        # phase(*args), adding its time to times[name] when timing, and its allocation peak to the stats
+        if times is None:
+            phase(*args)
+            return
+        memory = self.stats.memory
+        if memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        phase(*args)
+        times[name] = times.get(name, 0.0) + time.perf_counter() - start
+        if memory:
+            self.stats.record_peak(name, tracemalloc.get_traced_memory()[1] - base)
+
+    def _acc_copy(self):
+        # the accumulated accelerations, for _add_acc
+        return [(p.acc.x, p.acc.y) for p in self.particles]
+
+    def _add_acc(self, acc):
+        for p, (ax, ay) in zip(self.particles, acc):
+            p.acc.x += ax
+            p.acc.y += ay
+
+    def _spatial_index(self):
+        # the spatial index for the current positions
+        cell_size = self.repulsion_radius if self.repulsion_radius > 0 else 20
+        self.spatial_index.update(self.particles, (self.steps, len(self.particles)), cell_size)
+        return self.spatial_index
+
+    def nearest(self, x, y, max_dist=math.inf):
+        """The particle closest to (x, y), None if there is none within max_dist."""
+        return self._spatial_index().nearest(x, y, max_dist)
+
+    def within_radius(self, x, y, r) -> list:
+        """The particles at most r away from (x, y)."""
+        return self._spatial_index().within_radius(x, y, r)
+
+    def within_box(self, x0, y0, x1, y1) -> list:
+        """The particles inside the rectangle [x0, x1] x [y0, y1]."""
+        return self._spatial_index().within_box(x0, y0, x1, y1)
+
+    def apply_gravity(self):
+        gx, gy = self.gravity.x, self.gravity.y
+        for p in self.particles:
+            p.apply_force_xy(gx * p.mass, gy * p.mass)
+
+    def _wrap(self):
+        # separation mapping of periodic boundaries, None if separations are used as they are
+        return self.boundary.wrap_xy if self.boundary.periodic else None
+
+    def apply_springs(self):
+        if self.solver == "xpbd":
+            return
+        wrap = self._wrap()
         for s in self.springs:
-            s.apply()
+            s.apply(wrap)
 
-        if self.bending_springs:
+    def apply_bending(self):
+        if self.bending_springs and self.solver == "force":
+            wrap = self._wrap()
             for bs in self.bending_springs:
-                bs.apply()
-
-        # apply repulsion forces between particles to prevent overlap
-        for i, p1 in enumerate(self.particles):
-            for p2 in self.particles[i+1:]:
-                delta = p2.pos - p1.pos
-                dist = delta.length()
-                if dist > 0 and dist < self.repulsion_radius:
-                    direction = delta / dist
-                    force_magnitude = self.repulsion_strength * (self.repulsion_radius - dist) / self.repulsion_radius
-                    force = direction * force_magnitude
-                    p1.apply_force(-force)
-                    p2.apply_force(force)
+                bs.apply(wrap)
 
+    def _exclusions(self):
+        # the up to date exclusions, None if there are none
+        if not self.exclusions.active:
+            return None
+        self.exclusions.update(self.particles, self.springs, self.bending_springs)
+        return self.exclusions
+
+    def apply_repulsion(self):
+        # apply repulsion forces between particles to prevent overlap,
+        # only pairs in the same or neighbouring grid cells can be in range
+        if self.repulsion_radius <= 0:
+            return
+        excl = self._exclusions()
+        if self.neighbour_skin > 0:
+            # the list leaves excluded pairs out when it is built
+            pairs = self.neighbours.update(self.particles, self.repulsion_radius, self.neighbour_skin, self.boundary,
+                                           excl)
+            excl = None
+        else:
+            self.grid.cell_size = self.repulsion_radius
+            self.grid.box = self.boundary.size if self.boundary.periodic else None
+            self.grid.build(self.particles)
+            pairs = self.grid.pairs()
+        # component-wise to keep the innermost loop free of temporary vectors
+        radius = self.repulsion_radius
+        strength = self.repulsion_strength
+        wrap = self._wrap()
+        for p1, p2 in pairs:
+            if excl is not None and excl.excludes(p1, p2):
+                continue
+            dx = p2.pos.x - p1.pos.x
+            dy = p2.pos.y - p1.pos.y
+            if wrap is not None:
+                dx, dy = wrap(dx, dy)
+            dist = math.hypot(dx, dy)
+            if dist > 0 and dist < radius:
+                force_magnitude = strength * (radius - dist) / radius
+                fx = dx / dist * force_magnitude
+                fy = dy / dist * force_magnitude
+                p1.apply_force_xy(-fx, -fy)
+                p2.apply_force_xy(fx, fy)
+
+    def apply_drag(self, dt):
         # apply viscous damping and Brownian random forces
-        for p in self.particles:
+        gamma = self.damping_coeff
+        # Brownian force: Gaussian noise, variance 2·γ·T·m / dt (with k_B = 1)
+        sigmas = self.noise.sigmas(self.temperature, gamma, dt)
+        normal_pair = self.noise.normal_pair
+        for i, p in enumerate(self.particles):
             if p.fixed:
                 continue
             # estimate velocity from Verlet history
-            vel = (p.pos - p.prev_pos) / dt
-            # viscous drag: F_drag = -γ·m·v
-            drag = -self.damping_coeff * p.mass * vel
-            p.apply_force(drag)
-            # Brownian force: Gaussian noise, variance 2·γ·T·m / dt (with k_B = 1)
-            sigma = math.sqrt(2 * self.damping_coeff * self.temperature * p.mass / dt)
-            rand_fx = random.gauss(0, sigma)
-            rand_fy = random.gauss(0, sigma)
-            p.apply_force(pygame.Vector2(rand_fx, rand_fy))
+            vx = (p.pos.x - p.prev_pos.x) / dt
+            vy = (p.pos.y - p.prev_pos.y) / dt
+            sigma = sigmas[p.mass]
+            gx, gy = normal_pair(i)
+            # viscous drag F_drag = -γ·m·v plus the random force
+            p.apply_force_xy(gx * sigma - gamma * p.mass * vx, gy * sigma - gamma * p.mass * vy)
+        self.noise.advance()
 
+    def integrate(self, dt, damping=0.98):
         # integrate motion
         for p in self.particles:
-            p.integrate(dt, damping=0.98)
+            p.integrate(dt, damping=damping)
             # p.integrate(dt, damping=1)
+
+    def solve_constraints(self, dt):
+        # xpbd solver only: pull the integrated positions back onto the springs and bending springs
+        if self.solver != "xpbd":
+            return
+        wrap = self._wrap()
+        xpbd.break_springs(self.springs, wrap)
+        bending_springs = self.bending_springs or []
+        spring_lambdas = [0.0] * len(self.springs)
+        bending_lambdas = [0.0] * len(bending_springs)
+        for _ in range(self.xpbd_iterations):
+            xpbd.solve_springs(self.springs, spring_lambdas, dt, wrap)
+            xpbd.solve_bending(bending_springs, bending_lambdas, dt, wrap)
+
+    def apply_boundary(self):
+        self.boundary.apply(self.particles)
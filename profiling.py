@@ -0,0 +1,84 @@
+# profiling.py
+
+
+class StepStats:
+    """
+    Timings and counters collected by PhysicsEngine.update while profiling is
+    enabled (see PhysicsEngine.enable_profiling). Times are in seconds.
+    With memory=True the peak of the memory allocated by each phase is
+    recorded as well (tracemalloc must be tracing).
+    """
+    def __init__(self, phase_names, memory: bool = False):
+        self.phase_names = tuple(phase_names)
+        self.memory = memory
+        # tracemalloc was started for these stats and is stopped with them
+        self.started_tracing = False
+        self.reset()
+
+    def reset(self):
+        self.steps = 0
+        # per phase: time of the last step and cumulative time
+        self.last = {name: 0.0 for name in self.phase_names}
+        self.total = {name: 0.0 for name in self.phase_names}
+        # per phase: largest allocation peak of a step in bytes, with memory=True
+        self.peak = {name: 0 for name in self.phase_names}
+        self.last_step_time = 0.0
+        self.total_step_time = 0.0
+        # candidate pairs tested in the repulsion phase
+        self.last_pair_tests = 0
+        self.total_pair_tests = 0
+        # springs that broke
+        self.last_springs_broken = 0
+        self.total_springs_broken = 0
+        # neighbour list rebuilds
+        self.total_rebuilds = 0
+        # step sizes, they vary with PhysicsEngine(adaptive_dt=...)
+        self.last_dt = None
+        self.min_dt = self.max_dt = None
+        self.total_dt = 0.0
+
+    def record(self, phase_times: dict, step_time: float, pair_tests: int, springs_broken: int, rebuilds: int = 0,
+               dt: float = None):
+        """step_time is the whole update, phases plus whatever the engine does around them."""
+        self.steps += 1
+        for name, t in phase_times.items():
+            self.last[name] = t
+            self.total[name] += t
+        self.last_step_time = step_time
+        self.total_step_time += step_time
+        self.last_pair_tests = pair_tests
+        self.total_pair_tests += pair_tests
+        self.last_springs_broken = springs_broken
+        self.total_springs_broken += springs_broken
+        self.total_rebuilds += rebuilds
+        if dt is not None:
+            self.last_dt = dt
+            self.min_dt = dt if self.min_dt is None else min(self.min_dt, dt)
+            self.max_dt = dt if self.max_dt is None else max(self.max_dt, dt)
+            self.total_dt += dt
+
+    def record_peak(self, name: str, nbytes: int):
+        self.peak[name] = max(self.peak[name], nbytes)
+
+    def mean(self, name: str) -> float:
+        """Average time per step of a phase."""
+        return self.total[name] / self.steps if self.steps else 0.0
+
+    def lines(self) -> list[str]:
+        """Human readable summary, one entry per line."""
+        mean_step = self.total_step_time / self.steps if self.steps else 0.0
+        rate = 1 / mean_step if mean_step > 0 else 0.0
+        lines = [f"step {self.steps}: {self.last_step_time * 1e3:.2f} ms (mean {mean_step * 1e3:.2f} ms, {rate:.0f} steps/s)"]
+        for name in self.phase_names:
+            lines.append(f"{name:>10}: {self.last[name] * 1e3:6.2f} ms (mean {self.mean(name) * 1e3:.2f})")
+        lines.append(f"pair tests: {self.last_pair_tests}")
+        lines.append(f"springs broken: {self.last_springs_broken} (total {self.total_springs_broken})")
+        if self.min_dt is not None and self.min_dt != self.max_dt:
+            lines.append(f"dt: {self.last_dt * 1e3:.2f} ms (mean {self.total_dt / self.steps * 1e3:.2f}, "
+                         f"min {self.min_dt * 1e3:.2f}, max {self.max_dt * 1e3:.2f})")
+        if self.total_rebuilds:
+            lines.append(f"neighbour list rebuilds: {self.total_rebuilds} (every {self.steps / self.total_rebuilds:.1f} steps)")
+        return lines
+
+    def __str__(self):
+        return "\n".join(self.lines())
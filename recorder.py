@@ -0,0 +1,330 @@
+# recorder.py
+"""
+Chunked, append-only trajectory files and their replay.
+
+A trajectory is a binary file of chunks. Each chunk holds the topology at the
+time it was started (spring endpoints, particle colors and radii) followed by
+up to chunk_frames frames, each the engine's step count (physics.steps) with
+float32 positions and packed spring broken flags; a new chunk is started
+whenever the number of particles or springs changes. A sidecar index file (path + ".idx") has one fixed-size entry per
+chunk, so a reader can memory-map the trajectory and seek to any frame
+without scanning it.
+
+    python recorder.py record --scene rod --steps 20000 --every 10 rod.traj
+    python recorder.py replay rod.traj
+"""
+import argparse
+import os
+import struct
+
+import numpy as np
+
+FILE_MAGIC = b"PYLTRAJ1"
+FILE_HEADER = struct.Struct("<8sII")  # magic, version, reserved
+CHUNK_MAGIC = b"CHNK"
+# first_step is the engine step of the first frame, every the recorder's update calls per frame
+CHUNK_HEADER = struct.Struct("<4sIIIqq")  # magic, n_frames, n_particles, n_springs, first_step, every
+# 2: the engine step is stored in every frame
+VERSION = 2
+
+INDEX_DTYPE = np.dtype([
+    ("offset", "<i8"),  # file offset of the chunk header
+    ("first_frame", "<i8"),
+    ("n_frames", "<i8"),
+    ("n_particles", "<i8"),
+    ("n_springs", "<i8"),
+    ("first_step", "<i8"),
+    ("every", "<i8"),
+])
+
+# what the renderer draws for particles without color/radius
+DEFAULT_COLOR = (0, 0, 255)
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) // 8 * 8
+
+
+def topology_size(n_particles: int, n_springs: int) -> int:
+    # spring endpoints int32, colors uint8 rgb, radii float32, padded to 8 bytes
+    return _pad8(n_springs * 8 + n_particles * 3 + n_particles * 4)
+
+
+def frame_size(n_particles: int, n_springs: int) -> int:
+    # int64 step, float32 positions and packed broken flags, padded to 8 bytes
+    return 8 + _pad8(n_particles * 8 + (n_springs + 7) // 8)
+
+
+class TrajectoryRecorder:
+    """
+    Appends the state of an engine to a trajectory file. Call step() after
+    every physics.update; every k-th call records a frame, record() records
+    one now. Each frame keeps the engine's step count, which an update may
+    advance by more than one (adaptive_dt, FixedStepper). Frames are buffered
+    and written chunk by chunk, use as a context manager or call close().
+    """
+    def __init__(self, path: str, physics, every: int = 10, chunk_frames: int = 256):
+        self.path = path
+        self.physics = physics
+        self.every = every
+        self.chunk_frames = chunk_frames
+        # calls of step(), i.e. physics updates
+        self.steps = 0
+        self.frames_written = 0
+        self._frames = []
+        self._chunk_first_step = 0
+        self._chunk_shape = None
+        self._file = open(path, "wb")
+        self._file.write(FILE_HEADER.pack(FILE_MAGIC, VERSION, 0))
+        self._index = open(path + ".idx", "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def step(self):
+        self.steps += 1
+        if self.steps % self.every == 0:
+            self.record()
+
+    def record(self):
+        """Record the current state as a frame."""
+        pos = np.asarray(self.physics.positions(), dtype=np.float32).reshape(-1, 2)
+        broken = np.asarray(self.physics.broken_flags(), dtype=bool)
+        shape = (len(pos), len(broken))
+        if shape != self._chunk_shape or len(self._frames) >= self.chunk_frames:
+            self.flush()
+            self._chunk_shape = shape
+            self._chunk_first_step = self.physics.steps
+            self._topology = self._pack_topology()
+        frame = np.zeros(frame_size(*shape), dtype=np.uint8)
+        frame[:8] = np.array([self.physics.steps], dtype="<i8").view(np.uint8)
+        frame[8:8 + pos.nbytes] = pos.view(np.uint8).ravel()
+        packed = np.packbits(broken)
+        frame[8 + pos.nbytes:8 + pos.nbytes + len(packed)] = packed
+        self._frames.append(frame)
+
+    def _pack_topology(self) -> bytes:
+        physics = self.physics
+        index = {id(p): i for i, p in enumerate(physics.particles)}
+        ends = np.array([(index[id(s.p1)], index[id(s.p2)]) for s in physics.springs], dtype="<i4").reshape(-1, 2)
+        colors = np.array([p.color or DEFAULT_COLOR for p in physics.particles], dtype=np.uint8).reshape(-1, 3)
+        # 0 stands for "no radius set"
+        radii = np.array([p.radius or 0 for p in physics.particles], dtype="<f4")
+        data = ends.tobytes() + colors.tobytes() + radii.tobytes()
+        return data + bytes(topology_size(len(colors), len(ends)) - len(data))
+
+    def flush(self):
+        """Write the buffered frames as a chunk."""
+        if not self._frames:
+            return
+        n_particles, n_springs = self._chunk_shape
+        offset = self._file.tell()
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(self._frames), n_particles, n_springs,
+                                           self._chunk_first_step, self.every))
+        self._file.write(self._topology)
+        self._file.write(np.concatenate(self._frames).tobytes())
+        self._file.flush()
+        entry = np.array([(offset, self.frames_written, len(self._frames), n_particles, n_springs,
+                           self._chunk_first_step, self.every)], dtype=INDEX_DTYPE)
+        # the index entry goes last, so it never points at a chunk that is not complete
+        self._index.write(entry.tobytes())
+        self._index.flush()
+        self.frames_written += len(self._frames)
+        self._frames = []
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        self._index.close()
+
+
+def scan_index(path: str) -> np.ndarray:
+    """Rebuild the chunk index by walking the chunk headers, e.g. when the .idx file is lost."""
+    entries = []
+    size = os.path.getsize(path)
+    first_frame = 0
+    with open(path, "rb") as f:
+        offset = FILE_HEADER.size
+        while offset + CHUNK_HEADER.size <= size:
+            f.seek(offset)
+            magic, n_frames, n_particles, n_springs, first_step, every = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+            end = (offset + CHUNK_HEADER.size + topology_size(n_particles, n_springs)
+                   + n_frames * frame_size(n_particles, n_springs))
+            if magic != CHUNK_MAGIC or end > size:
+                break  # truncated tail of an interrupted recording
+            entries.append((offset, first_frame, n_frames, n_particles, n_springs, first_step, every))
+            first_frame += n_frames
+            offset = end
+    return np.array(entries, dtype=INDEX_DTYPE)
+
+
+class TrajectoryReader:
+    """
+    Random access to the frames of a trajectory file. The file is memory-mapped,
+    frames are returned as read-only views and only the pages touched are read.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, _ = FILE_HEADER.unpack(bytes(self._mm[:FILE_HEADER.size]))
+        if magic != FILE_MAGIC:
+            raise ValueError(f"{path} is not a trajectory file")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported trajectory version {version}")
+        if os.path.exists(path + ".idx"):
+            self.index = np.fromfile(path + ".idx", dtype=INDEX_DTYPE)
+        else:
+            self.index = scan_index(path)
+        self._starts = self.index["first_frame"]
+
+    def __len__(self):
+        if len(self.index) == 0:
+            return 0
+        last = self.index[-1]
+        return int(last["first_frame"] + last["n_frames"])
+
+    def chunk_of(self, frame: int) -> int:
+        if not 0 <= frame < len(self):
+            raise IndexError(f"frame {frame} out of range")
+        return int(np.searchsorted(self._starts, frame, side="right") - 1)
+
+    def topology(self, chunk: int):
+        """Spring endpoints (S, 2), colors (N, 3) and radii (N,) of a chunk."""
+        entry = self.index[chunk]
+        n, s = int(entry["n_particles"]), int(entry["n_springs"])
+        start = int(entry["offset"]) + CHUNK_HEADER.size
+        ends = self._mm[start:start + s * 8].view("<i4").reshape(s, 2)
+        start += s * 8
+        colors = self._mm[start:start + n * 3].reshape(n, 3)
+        start += n * 3
+        radii = self._mm[start:start + n * 4].view("<f4")
+        return ends, colors, radii
+
+    def frame(self, frame: int):
+        """Positions (N, 2), spring broken flags (S,) and engine step (physics.steps) of a frame."""
+        chunk = self.chunk_of(frame)
+        entry = self.index[chunk]
+        n, s = int(entry["n_particles"]), int(entry["n_springs"])
+        k = frame - int(entry["first_frame"])
+        start = (int(entry["offset"]) + CHUNK_HEADER.size + topology_size(n, s)
+                 + k * frame_size(n, s))
+        step = int(self._mm[start:start + 8].view("<i8")[0])
+        start += 8
+        pos = self._mm[start:start + n * 8].view("<f4").reshape(n, 2)
+        packed = self._mm[start + n * 8:start + n * 8 + (s + 7) // 8]
+        broken = np.unpackbits(packed, count=s).astype(bool)
+        return pos, broken, step
+
+
+def replay(path: str, fps: int = 60, size=None):
+    """
+    Play a trajectory in a window through Renderer.draw.
+    space = pause, left/right = one frame, page up/down = 10 % of the run,
+    home/end = first/last frame, click on the bar at the bottom to seek.
+    """
+    import pygame
+    from particle import Particle
+    from spring import Spring
+    from renderer import Renderer
+    from scenes import SCREEN_SIZE
+
+    reader = TrajectoryReader(path)
+    if len(reader) == 0:
+        raise ValueError(f"{path} contains no frames")
+    size = size or SCREEN_SIZE
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption(os.path.basename(path))
+    clock = pygame.time.Clock()
+    renderer = Renderer(screen)
+    font = pygame.font.SysFont("monospace", 14)
+
+    chunk = None
+    particles, springs = [], []
+    frame, playing, running = 0, True, True
+    jump = max(1, len(reader) // 10)
+    while running:
+        clock.tick(fps)
+        for e in pygame.event.get():
+            if e.type == pygame.QUIT:
+                running = False
+            elif e.type == pygame.KEYDOWN:
+                if e.key == pygame.K_SPACE:
+                    playing = not playing
+                elif e.key == pygame.K_RIGHT:
+                    frame += 1
+                elif e.key == pygame.K_LEFT:
+                    frame -= 1
+                elif e.key == pygame.K_PAGEUP:
+                    frame += jump
+                elif e.key == pygame.K_PAGEDOWN:
+                    frame -= jump
+                elif e.key == pygame.K_HOME:
+                    frame = 0
+                elif e.key == pygame.K_END:
+                    frame = len(reader) - 1
+            elif e.type == pygame.MOUSEBUTTONDOWN and e.button == 1 and e.pos[1] > size[1] - 20:
+                frame = int(e.pos[0] / size[0] * len(reader))
+        frame = max(0, min(frame, len(reader) - 1))
+
+        # rebuild the drawable objects when the topology changes
+        if reader.chunk_of(frame) != chunk:
+            chunk = reader.chunk_of(frame)
+            ends, colors, radii = reader.topology(chunk)
+            particles = [Particle((0, 0), color=tuple(int(c) for c in color), radius=float(r) or None)
+                         for color, r in zip(colors, radii)]
+            springs = [Spring(particles[a], particles[b], 0, 0) for a, b in ends.tolist()]
+        pos, broken, step = reader.frame(frame)
+        for p, (x, y) in zip(particles, pos.tolist()):
+            p.pos.update(x, y)
+        for s, b in zip(springs, broken.tolist()):
+            s.broken = b
+
+        screen.fill((30, 30, 30))
+        renderer.draw(particles, springs)
+        pygame.draw.rect(screen, (80, 80, 80), (0, size[1] - 20, size[0], 20))
+        pygame.draw.rect(screen, (200, 200, 200), (0, size[1] - 20, size[0] * (frame + 1) / len(reader), 20))
+        screen.blit(font.render(f"frame {frame}/{len(reader) - 1}  step {step}", True, (255, 255, 255)), (5, 5))
+        pygame.display.flip()
+        if playing and frame < len(reader) - 1:
+            frame += 1
+    pygame.quit()
+
+
+def main(argv=None):
+    from headless import ENGINES, build_engine
+    from scenes import SCENES
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="run a scene headless and record it")
+    rec.add_argument("path")
+    rec.add_argument("--scene", choices=sorted(SCENES), default="coccus")
+    rec.add_argument("--engine", choices=sorted(ENGINES), default="vectorized")
+    rec.add_argument("--steps", type=int, default=10000)
+    rec.add_argument("--dt", type=float, default=1 / 120)
+    rec.add_argument("--every", type=int, default=10)
+    play = sub.add_parser("replay", help="play a recorded trajectory")
+    play.add_argument("path")
+    play.add_argument("--fps", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        physics = build_engine(args.scene, args.engine)
+        with TrajectoryRecorder(args.path, physics, every=args.every) as recorder:
+            recorder.record()
+            for _ in range(args.steps):
+                physics.update(args.dt)
+                recorder.step()
+        print(f"{recorder.frames_written} frames written to {args.path}")
+    else:
+        replay(args.path, args.fps)
+
+
+if __name__ == '__main__':
+    main()
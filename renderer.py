@@ -1,22 +1,119 @@
 # renderer.py
 import pygame
+from spring import Spring
+
+SPRING_COLOR = (200, 200, 200)
+SPRING_WIDTH = 5
+# particles without color / radius
+DEFAULT_COLOR = (0, 0, 255)
+DEFAULT_RADIUS = 10
+
+
+def spring_chains(springs: list) -> tuple[list, list]:
+    """
+    Group springs into chains of particles joined end to end, following the
+    order of the list: a wall built by create_wall/coccus/create_rod becomes a
+    single closed chain, whatever cross springs are interleaved with it.
+    Returns (closed chains, open chains), each a list of particle lists.
+    """
+    closed, chains = [], []
+    # particle id -> chains currently ending at that particle, last extended last
+    open_ends = {}
+    for s in springs:
+        ending = open_ends.get(id(s.p1))
+        if ending:
+            chain = ending.pop()
+            if s.p2 is chain[0]:
+                closed.append(chain)
+                chains.remove(chain)
+                continue
+            chain.append(s.p2)
+        else:
+            chain = [s.p1, s.p2]
+            chains.append(chain)
+        open_ends.setdefault(id(s.p2), []).append(chain)
+    return closed, chains
+
 
 class Renderer:
     def __init__(self, screen: pygame.Surface):
         self.screen = screen
+        self.font = None
+        # particle sprites per (color, radius)
+        self.sprites = {}
+        # what the current draw lists were built from, see _layout
+        self._key = None
 
-    def draw(self, particles: list, springs: list):
-        # draw springs
-        for s in springs:
-            if getattr(s, "broken", False):
-                continue
-            # if s.invisible:
-            #     continue
-            pygame.draw.line(self.screen, (200, 200, 200), s.p1.pos, s.p2.pos, 5)
+    def sprite(self, color, radius) -> pygame.Surface:
+        """Pre-rendered circle, drawn by blitting it at (x - radius, y - radius)."""
+        sprite = self.sprites.get((color, radius))
+        if sprite is None:
+            size = int(2 * radius + 1)
+            sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (size // 2, size // 2), radius=radius)
+            self.sprites[(color, radius)] = sprite
+        return sprite
 
-        # draw particles
+    def invalidate(self):
+        """Rebuild the draw lists on the next frame, call after changing color/radius/invisible."""
+        self._key = None
+
+    def _layout(self, particles, springs):
+        # visible springs grouped into polylines of particle indices plus one sprite per
+        # particle; rebuilt when the lists are replaced or resized, or any spring
+        # breaks or is mended (Spring.broken_changes)
+        key = (id(particles), len(particles), id(springs), len(springs), Spring.broken_changes)
+        if key == self._key:
+            return
+        self._key = key
+        index = {id(p): i for i, p in enumerate(particles)}
+        visible = [s for s in springs if not s.broken and not s.invisible]
+        closed, chains = spring_chains(visible)
+        self.closed_chains = [[index[id(p)] for p in chain] for chain in closed]
+        self.open_chains = [[index[id(p)] for p in chain] for chain in chains]
+        self.particle_sprites = []
         for p in particles:
-            # color = (255, 0, 0) if p.fixed else (0, 0, 255)
-            color = p.color if p.color else (0, 0, 255)
-            radius = p.radius if p.radius else 10
-            pygame.draw.circle(self.screen, color, (int(p.pos.x), int(p.pos.y)), radius=radius)
+            radius = p.radius if p.radius else DEFAULT_RADIUS
+            half = int(2 * radius + 1) // 2
+            self.particle_sprites.append((self.sprite(p.color if p.color else DEFAULT_COLOR, radius), half))
+
+    def draw(self, particles: list, springs: list, stats=None, alpha: float = None):
+        """
+        alpha in [0, 1] draws every particle that fraction of the way from
+        prev_pos to pos, for smooth motion when physics runs at a fixed rate
+        independent of the frame rate (see fixed_step.FixedStepper).
+        """
+        self._layout(particles, springs)
+        screen = self.screen
+        if alpha is None:
+            points = [(p.pos.x, p.pos.y) for p in particles]
+        else:
+            points = [(p.prev_pos.x + (p.pos.x - p.prev_pos.x) * alpha, p.prev_pos.y + (p.pos.y - p.prev_pos.y) * alpha)
+                      for p in particles]
+
+        # draw springs, one polyline per chain
+        for chain in self.closed_chains:
+            pygame.draw.lines(screen, SPRING_COLOR, True, [points[i] for i in chain], SPRING_WIDTH)
+        for chain in self.open_chains:
+            if len(chain) == 2:
+                pygame.draw.line(screen, SPRING_COLOR, points[chain[0]], points[chain[1]], SPRING_WIDTH)
+            else:
+                pygame.draw.lines(screen, SPRING_COLOR, False, [points[i] for i in chain], SPRING_WIDTH)
+
+        # draw particles in one batch
+        screen.blits([(sprite, (int(x) - half, int(y) - half))
+                      for (x, y), (sprite, half) in zip(points, self.particle_sprites)], False)
+
+        # profiling overlay
+        if stats is not None:
+            self.draw_stats(stats)
+
+    def draw_stats(self, stats):
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.SysFont("monospace", 14)
+        y = 5
+        for line in stats.lines():
+            text = self.font.render(line, True, (255, 255, 255), (30, 30, 30))
+            self.screen.blit(text, (5, y))
+            y += text.get_height()
@@ -0,0 +1,87 @@
+# scenes.py
+import math
+from vector import Vec2
+from structures import create_wall, create_bending_wall, create_rod, coccus
+from boundaries import Clamp
+
+# window size of the interactive apps, scenes are centred in it
+SCREEN_SIZE = (1300, 900)
+
+
+def coccus_scene(size=SCREEN_SIZE):
+    """
+    The nested walls of start.py.
+    Returns particles, springs, bending springs and the engine keyword arguments.
+    """
+    center = Vec2(size) / 2
+    wall1_particles, wall1_springs = coccus(center, radius=150, segments=150, tag="spring1", color=(255, 0, 0), stiffness=2000)
+    wall0_particles, wall0_springs = create_wall(center, radius=100, segments=100, tag="spring0", color=(0, 255, 0), stiffness=2000)
+    wall2_particles, wall2_springs = create_wall(center, radius=50, segments=50, tag="spring2", color=(0, 0, 255), stiffness=2000)
+    particles = wall0_particles + wall1_particles + wall2_particles
+    springs = wall0_springs + wall1_springs + wall2_springs
+    params = dict(gravity=(0, 0), repulsion_radius=30, repulsion_strength=1000, temperature=500, damping_coeff=1,
+                  boundary=Clamp(size))
+    return particles, springs, [], params
+
+
+def rod_scene(size=SCREEN_SIZE):
+    """
+    The two skeleton rods of start_rod.py.
+    Returns particles, springs, bending springs and the engine keyword arguments.
+    """
+    center = Vec2(size) / 2
+    loc1 = center - Vec2((0, -300))
+    loc2 = center - Vec2((0, 300))
+    wall2_particles, wall2_springs = create_rod(loc1, radius=80, length=200, segments=50, tag="spring1",
+                                                stiffness=3000, max_force=None,
+                                                include_cytoskeleton=False, cyto_stiffness=200,
+                                                include_skeleton=True, skeleton_count=5, skeleton_stiffness=1000)
+    wall1_particles, wall1_springs = create_rod(loc2, radius=100, length=500, segments=100, tag="spring1",
+                                                stiffness=2000, max_force=None,
+                                                include_cytoskeleton=False, cyto_stiffness=200,
+                                                include_skeleton=True, skeleton_count=10, skeleton_stiffness=2000)
+    particles = wall2_particles + wall1_particles
+    springs = wall2_springs + wall1_springs
+    params = dict(gravity=(0, 0), repulsion_radius=30, repulsion_strength=10000, temperature=500, damping_coeff=1,
+                  boundary=Clamp(size))
+    return particles, springs, [], params
+
+
+def bending_wall_scene(size=SCREEN_SIZE):
+    """
+    The bending wall of start_bending_wall.py.
+    Returns particles, springs, bending springs and the engine keyword arguments.
+    """
+    center = Vec2(size) / 2
+    particles, springs, bending_springs = create_bending_wall(center, radius=100, segments=3,
+                                                              tag="spring1", color=(255, 0, 0),
+                                                              stiffness=2000, bending_stiffness=500)
+    params = dict(gravity=(0, 0), repulsion_radius=30, repulsion_strength=10000, temperature=0, damping_coeff=1,
+                  boundary=Clamp(size))
+    return particles, springs, bending_springs, params
+
+
+SCENES = {
+    "coccus": coccus_scene,
+    "rod": rod_scene,
+    "bending_wall": bending_wall_scene,
+}
+
+
+def synthetic_scene(n_particles: int, segments: int = 50, radius: float = 60):
+    """
+    Roughly n_particles particles as a square lattice of circular walls with
+    the parameters of the coccus scene, for scaling measurements.
+    Returns particles, springs, bending springs and the engine keyword arguments.
+    """
+    n_walls = max(1, round(n_particles / segments))
+    per_row = math.ceil(math.sqrt(n_walls))
+    spacing = 2.5 * radius
+    particles, springs = [], []
+    for k in range(n_walls):
+        center = Vec2(spacing * (k % per_row + 0.5), spacing * (k // per_row + 0.5))
+        wall_particles, wall_springs = create_wall(center, radius=radius, segments=segments, tag=f"wall{k}", stiffness=2000)
+        particles.extend(wall_particles)
+        springs.extend(wall_springs)
+    params = dict(gravity=(0, 0), repulsion_radius=30, repulsion_strength=1000, temperature=500, damping_coeff=1)
+    return particles, springs, [], params
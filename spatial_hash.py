@@ -0,0 +1,111 @@
+# spatial_hash.py
+from collections import defaultdict
+
+# neighbour offsets visited from every cell; together with the cell itself they
+# cover each pair of adjacent cells exactly once ("half shell")
+HALF_SHELL = ((1, 0), (1, 1), (0, 1), (-1, 1))
+
+
+def periodic_shape(box, cell_size):
+    """
+    (cell width, cell count) along x and y of a periodic grid over box: the
+    box is split into whole cells of at least cell_size, fewer than 3 per axis
+    collapse into one so that a neighbour is never reached from both sides.
+    """
+    shape = []
+    for length in box:
+        n = int(length // cell_size)
+        if n < 3:
+            n = 1
+        shape.append((length / n, n))
+    return shape
+
+
+def periodic_offsets(nx, ny):
+    """
+    HALF_SHELL for a periodic grid of nx by ny cells: along a collapsed axis
+    the offsets fold onto each other, keep one of every offset and its mirror.
+    """
+    offsets = []
+    for dx, dy in HALF_SHELL:
+        dx = dx if nx > 1 else 0
+        dy = dy if ny > 1 else 0
+        if (dx, dy) != (0, 0) and (dx, dy) not in offsets and (-dx, -dy) not in offsets:
+            offsets.append((dx, dy))
+    return offsets
+
+
+class SpatialHash:
+    """
+    Uniform grid (cell list) used as a broadphase for short-range pair forces.
+    With cell_size >= interaction radius every interacting pair lies in the
+    same or in an adjacent cell, so only those need to be tested.
+    With box = (W, H) the grid is periodic: cells at opposite edges of the box
+    are neighbours.
+    """
+    def __init__(self, cell_size: float, box=None):
+        self.cell_size = cell_size
+        self.box = box
+        self.cells = defaultdict(list)
+
+    def cell_of(self, pos):
+        # floor division instead of math.floor so that nan/inf positions of an
+        # exploded simulation end up in their own cell instead of raising
+        if self.box is None:
+            return pos.x // self.cell_size, pos.y // self.cell_size
+        (wx, nx), (wy, ny) = periodic_shape(self.box, self.cell_size)
+        return pos.x // wx % nx, pos.y // wy % ny
+
+    def build(self, particles):
+        self.cells = defaultdict(list)
+        cells = self.cells
+        if self.box is None:
+            size = self.cell_size
+            for p in particles:
+                cells[(p.pos.x // size, p.pos.y // size)].append(p)
+            return
+        (wx, nx), (wy, ny) = periodic_shape(self.box, self.cell_size)
+        self.shape = (nx, ny)
+        self.offsets = periodic_offsets(nx, ny)
+        for p in particles:
+            cells[(p.pos.x // wx % nx, p.pos.y // wy % ny)].append(p)
+
+    def neighbours(self, cx, cy) -> list:
+        """Keys of the half-shell neighbour cells of cell (cx, cy), empty or not."""
+        if self.box is None:
+            return [(cx + dx, cy + dy) for dx, dy in HALF_SHELL]
+        nx, ny = self.shape
+        return [((cx + dx) % nx, (cy + dy) % ny) for dx, dy in self.offsets]
+
+    def pairs(self):
+        """
+        Yield every candidate pair (p1, p2) exactly once. Particles inside a
+        cell keep the order in which they were inserted.
+        """
+        cells = self.cells
+        for (cx, cy), members in cells.items():
+            n = len(members)
+            for i in range(n):
+                p1 = members[i]
+                for j in range(i + 1, n):
+                    yield p1, members[j]
+            for key in self.neighbours(cx, cy):
+                other = cells.get(key)
+                if not other:
+                    continue
+                for p1 in members:
+                    for p2 in other:
+                        yield p1, p2
+
+    def pair_count(self) -> int:
+        """Number of pairs pairs() yields, without generating them."""
+        cells = self.cells
+        count = 0
+        for (cx, cy), members in cells.items():
+            n = len(members)
+            count += n * (n - 1) // 2
+            for key in self.neighbours(cx, cy):
+                other = cells.get(key)
+                if other:
+                    count += n * len(other)
+        return count
@@ -0,0 +1,92 @@
+# spatial_index.py
+import math
+from spatial_hash import SpatialHash
+
+
+class SpatialIndex:
+    """
+    Grid over the particle positions for PhysicsEngine.nearest, within_radius
+    and within_box. It is rebuilt lazily: the engine passes a key that changes
+    with every step, and the grid is only rebuilt by the first query after it
+    changed. Queries use plain coordinates, also with periodic boundaries.
+    """
+    def __init__(self, cell_size: float = 20):
+        self.grid = SpatialHash(cell_size)
+        # range of occupied cells, (x0, y0, x1, y1), None if there are none
+        self.bounds = None
+        self._key = None
+
+    def invalidate(self):
+        """Rebuild on the next query, e.g. after moving particles by hand."""
+        self._key = None
+
+    def update(self, particles, key, cell_size: float = None):
+        if cell_size is not None and cell_size != self.grid.cell_size:
+            self.grid.cell_size = cell_size
+            self._key = None
+        if key == self._key:
+            return
+        self._key = key
+        self.grid.build(particles)
+        # cells of non-finite positions are never queried
+        finite = [c for c in self.grid.cells if math.isfinite(c[0]) and math.isfinite(c[1])]
+        if finite:
+            xs = [c[0] for c in finite]
+            ys = [c[1] for c in finite]
+            self.bounds = (min(xs), min(ys), max(xs), max(ys))
+        else:
+            self.bounds = None
+
+    def _cells(self, cx0, cy0, cx1, cy1):
+        # members of the occupied cells in the given (inclusive) range
+        if self.bounds is None:
+            return
+        bx0, by0, bx1, by1 = self.bounds
+        cells = self.grid.cells
+        for cx in range(int(max(cx0, bx0)), int(min(cx1, bx1)) + 1):
+            for cy in range(int(max(cy0, by0)), int(min(cy1, by1)) + 1):
+                members = cells.get((cx, cy))
+                if members:
+                    yield from members
+
+    def within_box(self, x0, y0, x1, y1) -> list:
+        size = self.grid.cell_size
+        return [p for p in self._cells(x0 // size, y0 // size, x1 // size, y1 // size)
+                if x0 <= p.pos.x <= x1 and y0 <= p.pos.y <= y1]
+
+    def within_radius(self, x, y, r) -> list:
+        size = self.grid.cell_size
+        r2 = r * r
+        return [p for p in self._cells((x - r) // size, (y - r) // size, (x + r) // size, (y + r) // size)
+                if (p.pos.x - x) ** 2 + (p.pos.y - y) ** 2 <= r2]
+
+    def nearest(self, x, y, max_dist=math.inf):
+        if self.bounds is None:
+            return None
+        size = self.grid.cell_size
+        cx, cy = x // size, y // size
+        bx0, by0, bx1, by1 = self.bounds
+        # rings beyond this one hold no particles
+        last = max(cx - bx0, bx1 - cx, cy - by0, by1 - cy)
+        best = None
+        best_d2 = max_dist * max_dist
+        k = 0
+        # ring k holds the cells k steps away from the query cell, all further
+        # than (k - 1) * size from the query point
+        while k <= last and (max(k - 1, 0) * size) ** 2 < best_d2:
+            if k == 0:
+                ring = self._cells(cx, cy, cx, cy)
+            else:
+                ring = self._ring(cx, cy, k)
+            for p in ring:
+                d2 = (p.pos.x - x) ** 2 + (p.pos.y - y) ** 2
+                if d2 < best_d2:
+                    best, best_d2 = p, d2
+            k += 1
+        return best
+
+    def _ring(self, cx, cy, k):
+        yield from self._cells(cx - k, cy - k, cx + k, cy - k)
+        yield from self._cells(cx - k, cy + k, cx + k, cy + k)
+        yield from self._cells(cx - k, cy - k + 1, cx - k, cy + k - 1)
+        yield from self._cells(cx + k, cy - k + 1, cx + k, cy + k - 1)
@@ -1,9 +1,13 @@
 # spring.py
-import pygame
+import math
 from particle import Particle
 
 
 class Spring:
+    # bumped whenever any spring breaks or is mended, so views of the springs
+    # (Renderer) can tell that they changed without scanning them
+    broken_changes = 0
+
     def __init__(self, p1: Particle, p2: Particle, rest_length: float, stiffness: float, max_force: float = None,
                  invisible: bool = False):
         self.p1 = p1
@@ -11,25 +15,50 @@ class Spring:
         self.rest_length = rest_length
         self.stiffness = stiffness
         self.max_force = max_force
-        self.broken = False
+        self._broken = False
         self.invisible = invisible
 
-    def apply(self):
-        if self.broken:
+    @property
+    def broken(self) -> bool:
+        return self._broken
+
+    @broken.setter
+    def broken(self, value):
+        value = bool(value)
+        if value != self._broken:
+            self._broken = value
+            Spring.broken_changes += 1
+
+    def apply(self, wrap=None):
+        """wrap maps the separation (dx, dy) of the ends to the one to use, see Boundary.wrap_xy."""
+        if self._broken:
             return
-        delta = self.p2.pos - self.p1.pos
-        dist = delta.length()
+        # component-wise, this runs once per spring per step
+        dx = self.p2.pos.x - self.p1.pos.x
+        dy = self.p2.pos.y - self.p1.pos.y
+        if wrap is not None:
+            dx, dy = wrap(dx, dy)
+        dist = math.hypot(dx, dy)
         if dist == 0:
             return
         # Hooke's law force
         diff = (dist - self.rest_length) / dist
-        force = delta * (self.stiffness * diff * 0.5)
+        scale = self.stiffness * diff * 0.5
+        fx = dx * scale
+        fy = dy * scale
         # break spring if force exceeds threshold
-        if self.max_force is not None and force.length() > self.max_force:
+        if self.max_force is not None and math.hypot(fx, fy) > self.max_force:
             self.broken = True
             return
-        self.p1.apply_force(force)
-        self.p2.apply_force(-force)
+        self.p1.apply_force_xy(fx, fy)
+        self.p2.apply_force_xy(-fx, -fy)
 
-    def potential_energy(self):
-        return 0.5 * self.stiffness * ((self.p2.pos - self.p1.pos).length() - self.rest_length) ** 2
+    def potential_energy(self, wrap=None):
+        # apply puts ½·k·stretch on each end, the stiffness between them is k/2
+        if self.broken:
+            return 0.0
+        dx = self.p2.pos.x - self.p1.pos.x
+        dy = self.p2.pos.y - self.p1.pos.y
+        if wrap is not None:
+            dx, dy = wrap(dx, dy)
+        return 0.25 * self.stiffness * (math.hypot(dx, dy) - self.rest_length) ** 2
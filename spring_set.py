@@ -0,0 +1,71 @@
+# spring_set.py
+import numpy as np
+from spring import Spring
+from array_utils import scatter_add
+
+
+class SpringSet:
+    """
+    Array form of a list of Springs: endpoint indices, rest lengths,
+    stiffnesses, max_force and the broken mask, so that all Hooke forces of a
+    step are computed in one vectorized pass.
+    Newly broken springs are also flagged on their Spring objects.
+    """
+    def __init__(self, springs: list[Spring], index: dict):
+        """index maps id(particle) to the particle's row in the position array."""
+        self.springs = springs
+        self.p1 = np.array([index[id(s.p1)] for s in springs], dtype=np.int64)
+        self.p2 = np.array([index[id(s.p2)] for s in springs], dtype=np.int64)
+        self.refresh()
+
+    @classmethod
+    def from_arrays(cls, p1, p2, rest_length, stiffness, max_force, broken):
+        """A SpringSet over plain arrays, without Spring objects to flag or refresh from."""
+        ss = cls.__new__(cls)
+        ss.springs = None
+        ss.p1, ss.p2 = p1, p2
+        ss.rest_length, ss.stiffness, ss.max_force, ss.broken = rest_length, stiffness, max_force, broken
+        return ss
+
+    def __len__(self):
+        return len(self.p1)
+
+    def refresh(self):
+        """Re-read the spring parameters and broken flags from the Spring objects."""
+        springs = self.springs
+        self.rest_length = np.array([s.rest_length for s in springs], dtype=float)
+        self.stiffness = np.array([s.stiffness for s in springs], dtype=float)
+        # no threshold is the same as an infinite one
+        self.max_force = np.array([np.inf if s.max_force is None else s.max_force for s in springs], dtype=float)
+        self.broken = np.array([s.broken for s in springs], dtype=bool)
+
+    def apply(self, pos: np.ndarray, force: np.ndarray, wrap=None) -> int:
+        """
+        Accumulate the spring forces for positions pos into the (N, 2) array
+        force. Returns the number of springs that broke in this pass.
+        wrap maps the separations of the ends, see Boundary.wrap.
+        """
+        if len(self) == 0:
+            return 0
+        delta = pos[self.p2] - pos[self.p1]
+        if wrap is not None:
+            delta = wrap(delta)
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        active = ~self.broken & (dist != 0)
+        # Hooke's law force, ½·k·(|d| - L) along d on each end
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diff = np.where(active, (dist - self.rest_length) / dist, 0.0)
+        scale = self.stiffness * diff * 0.5
+        # break spring if force exceeds threshold, a breaking spring exerts no force
+        snapped = active & (np.abs(scale) * dist > self.max_force)
+        n_snapped = int(np.count_nonzero(snapped))
+        if n_snapped:
+            self.broken |= snapped
+            if self.springs is not None:
+                for k in np.flatnonzero(snapped):
+                    self.springs[k].broken = True
+            scale[snapped] = 0.0
+        f = delta * scale[:, None]
+        scatter_add(force, self.p1, f)
+        scatter_add(force, self.p2, -f)
+        return n_snapped
@@ -6,7 +6,10 @@ import pygame
 
 from particle import Particle
 from physics import PhysicsEngine
+# from vectorized_physics import VectorizedPhysicsEngine as PhysicsEngine
 from renderer import Renderer
+from boundaries import Clamp, Periodic
+from fixed_step import FixedStepper
 from spring import Spring
 from structures import create_wall, create_wall_rod, coccus
 
@@ -15,7 +18,11 @@ from structures import create_wall, create_wall_rod, coccus
 # SCREEN_SIZE = (1500, 900)
 SCREEN_SIZE = (1300, 900)
 # FPS = 60
-FPS = 120
+# FPS = 120
+FPS = 60
+# physics steps per second, independent of FPS; with the vectorized engine
+# stiff walls can run at 1000-2000
+PHYSICS_HZ = 120
 
 
 class CellWallApp:
@@ -43,13 +50,14 @@ class CellWallApp:
                                      # repulsion_radius=150, repulsion_strength=100,
                                      repulsion_radius=30, repulsion_strength=1000,
                                      # repulsion_radius=30, repulsion_strength=10000,
-                                     temperature=500, damping_coeff=1)
-                                     # temperature=0, damping_coeff=1)
-                                     # temperature=0, damping_coeff=0)
+                                     temperature=500, damping_coeff=1,
+                                     # temperature=0, damping_coeff=1,
+                                     # temperature=0, damping_coeff=0,
+                                     boundary=Clamp(SCREEN_SIZE))
+                                     # boundary=Clamp(SCREEN_SIZE, bouncy=True))
+                                     # boundary=Periodic(SCREEN_SIZE))
         self.renderer = Renderer(self.screen)
-        self.clamp_to_window = True
-        self.bouncy_clamp = False
-        self.periodic_boundary = False
+        self.stepper = FixedStepper(self.physics, PHYSICS_HZ)
 
     def _loose_particles(self, count=20):
         """Add `count` free-floating particles randomly inside the cell wall."""
@@ -68,15 +76,15 @@ class CellWallApp:
     def run(self):
         running = True
         while running:
-            dt = self.clock.tick(FPS) / 1000
+            frame_time = self.clock.tick(FPS) / 1000
             for e in pygame.event.get():
                 if e.type == pygame.QUIT:
                     running = False
                 elif e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
                     # select nearest particle
-                    mouse = pygame.Vector2(e.pos)
-                    self.selected = min(self.particles, key=lambda p: (p.pos - mouse).length())
-                    self.selected.fixed = True
+                    self.selected = self.physics.nearest(*e.pos)
+                    if self.selected:
+                        self.selected.fixed = True
                 elif e.type == pygame.MOUSEBUTTONUP and e.button == 1:
                     if self.selected:
                         self.selected.fixed = False
@@ -98,10 +106,12 @@ class CellWallApp:
                 elif e.type == pygame.KEYDOWN and e.key == pygame.K_k:
                     for spring in self.springs:
                         spring.stiffness = max(spring.stiffness - 50, 0)
+                    self.physics.springs_changed()
                     print(f"Spring Stiffnes: {spring.stiffness}")
                 elif e.type == pygame.KEYDOWN and e.key == pygame.K_l:
                     for spring in self.springs:
                         spring.stiffness = spring.stiffness + 50
+                    self.physics.springs_changed()
                     print(f"Spring Stiffnes: {spring.stiffness}")
 
                 elif e.type == pygame.KEYDOWN and e.key == pygame.K_n:
@@ -111,6 +121,13 @@ class CellWallApp:
                     self.physics.temperature += 50
                     print(f"Temperature: {self.physics.temperature}")
 
+                elif e.type == pygame.KEYDOWN and e.key == pygame.K_i:
+                    # toggle the per-phase timing overlay
+                    if self.physics.stats is None:
+                        self.physics.enable_profiling()
+                    else:
+                        self.physics.disable_profiling()
+
                 elif e.type == pygame.KEYDOWN and e.key == pygame.K_q:
                     # delete all loose particles
                     for p in self.particles:
@@ -125,48 +142,12 @@ class CellWallApp:
             # drag selected
             if self.selected:
                 # move it directly to the mouse without imparting velocity
-                self.selected.pos = pygame.Vector2(pygame.mouse.get_pos())
-                self.selected.prev_pos = self.selected.pos.copy()
-
-            self.physics.update(dt)
-            # handle window boundaries
-            W, H = SCREEN_SIZE
-            if self.periodic_boundary:
-                # wrap-around
-                for p in self.particles:
-                    p.pos.x %= W
-                    p.pos.y %= H
-                    p.prev_pos.x %= W
-                    p.prev_pos.y %= H
-            elif self.clamp_to_window:
-                if self.bouncy_clamp:
-                    # existing reflective code...
-                    for p in self.particles:
-                        v = p.pos - p.prev_pos
-                        if p.pos.x < 0 or p.pos.x > W:
-                            p.pos.x = max(0, min(p.pos.x, W))
-                            p.prev_pos.x = p.pos.x + (-v.x)
-                        if p.pos.y < 0 or p.pos.y > H:
-                            p.pos.y = max(0, min(p.pos.y, H))
-                            p.prev_pos.y = p.pos.y + (-v.y)
-                else:
-                    # existing simple clamp
-                    for p in self.particles:
-                        if p.pos.x < 0:
-                            p.pos.x = 0;
-                            p.prev_pos.x = p.pos.x
-                        elif p.pos.x > W:
-                            p.pos.x = W;
-                            p.prev_pos.x = p.pos.x
-                        if p.pos.y < 0:
-                            p.pos.y = 0;
-                            p.prev_pos.y = p.pos.y
-                        elif p.pos.y > H:
-                            p.pos.y = H;
-                            p.prev_pos.y = p.pos.y
+                self.selected.pos.update(pygame.mouse.get_pos())
+                self.selected.prev_pos.update(self.selected.pos)
 
+            self.stepper.advance(frame_time)
             self.screen.fill((30, 30, 30))
-            self.renderer.draw(self.particles, self.springs)
+            self.renderer.draw(self.particles, self.springs, stats=self.physics.stats, alpha=self.stepper.alpha)
             pygame.display.flip()
 
         pygame.quit()
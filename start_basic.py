@@ -5,9 +5,12 @@ from particle import Particle
 from spring import Spring
 from physics import PhysicsEngine
 from renderer import Renderer
+from fixed_step import FixedStepper
 
 SCREEN_SIZE = (800, 600)
 FPS = 60
+# physics steps per second, independent of FPS
+PHYSICS_HZ = 60
 
 
 class CellWallApp:
@@ -23,6 +26,7 @@ class CellWallApp:
         self.physics = PhysicsEngine(self.particles, self.springs, gravity=(0, 0),
                                      repulsion_radius=100, repulsion_strength=500)
         self.renderer = Renderer(self.screen)
+        self.stepper = FixedStepper(self.physics, PHYSICS_HZ)
 
     def _create_wall(self):
         center = pygame.Vector2(SCREEN_SIZE) / 2
@@ -52,15 +56,15 @@ class CellWallApp:
     def run(self):
         running = True
         while running:
-            dt = self.clock.tick(FPS) / 1000
+            frame_time = self.clock.tick(FPS) / 1000
             for e in pygame.event.get():
                 if e.type == pygame.QUIT:
                     running = False
                 elif e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
                     # select nearest particle
-                    mouse = pygame.Vector2(e.pos)
-                    self.selected = min(self.particles, key=lambda p: (p.pos - mouse).length())
-                    self.selected.fixed = True
+                    self.selected = self.physics.nearest(*e.pos)
+                    if self.selected:
+                        self.selected.fixed = True
                 elif e.type == pygame.MOUSEBUTTONUP and e.button == 1:
                     if self.selected:
                         self.selected.fixed = False
@@ -69,12 +73,12 @@ class CellWallApp:
             # drag selected
             if self.selected:
                 # move it directly to the mouse without imparting velocity
-                self.selected.pos = pygame.Vector2(pygame.mouse.get_pos())
-                self.selected.prev_pos = self.selected.pos.copy()
+                self.selected.pos.update(pygame.mouse.get_pos())
+                self.selected.prev_pos.update(self.selected.pos)
 
-            self.physics.update(dt)
+            self.stepper.advance(frame_time)
             self.screen.fill((30, 30, 30))
-            self.renderer.draw(self.particles, self.springs)
+            self.renderer.draw(self.particles, self.springs, alpha=self.stepper.alpha)
             pygame.display.flip()
 
         pygame.quit()
@@ -1,12 +1,12 @@
 # structures.py
 import math
-import pygame
+from vector import Vec2
 from particle import Particle
 from spring import Spring
 from bending_spring import BendingSpring
 
 
-def create_wall(center: pygame.Vector2, radius: float = 100, segments: int = 20,
+def create_wall(center: Vec2, radius: float = 100, segments: int = 20,
                 tag: str = "wall", stiffness: float = 200, max_force: float = None, color=(255, 0, 0)):
     """
     Create a circular wall of particles and connecting springs.
@@ -17,7 +17,7 @@ def create_wall(center: pygame.Vector2, radius: float = 100, segments: int = 20,
     # create particles in a circle
     for i in range(segments):
         theta = (i / segments) * 2 * math.pi
-        pos = center + pygame.Vector2(math.cos(theta), math.sin(theta)) * radius
+        pos = center + Vec2(math.cos(theta), math.sin(theta)) * radius
         a = round(math.sin(i / segments * math.pi) * 255)
         p = Particle(position=pos, tag=tag, color=(a, 0, 255 - a))
         particles.append(p)
@@ -30,11 +30,12 @@ def create_wall(center: pygame.Vector2, radius: float = 100, segments: int = 20,
     return particles, springs
 
 
-def create_bending_wall(center: pygame.Vector2, radius: float = 100, segments: int = 20,
+def create_bending_wall(center: Vec2, radius: float = 100, segments: int = 20,
                         tag: str = "wall", stiffness: float = 200, max_force: float = None,
-                        color=(255, 0, 0), bending_stiffness: float = 100.0):
+                        color=(255, 0, 0), bending_stiffness: float = 100.0, signed: bool = False):
     """
     Create a circular wall of particles with linear springs and perpendicular bending springs.
+    signed is passed on to the bending springs (see BendingSpring).
     Returns three lists: particles, linear springs, bending springs.
     """
     # First build the linear wall
@@ -55,12 +56,12 @@ def create_bending_wall(center: pygame.Vector2, radius: float = 100, segments: i
         bending_springs.append(
             BendingSpring(p_prev, p_curr, p_next,
                           rest_angle=rest_angle,
-                          stiffness=bending_stiffness)
+                          stiffness=bending_stiffness, signed=signed)
         )
     return particles, springs, bending_springs
 
 
-def create_wall_rod(center: pygame.Vector2, radius: float = 100, segments: int = 20,
+def create_wall_rod(center: Vec2, radius: float = 100, segments: int = 20,
                     tag: str = "wall", stiffness: float = 200, max_force: float = None, color=(255, 0, 0)):
     """
     Create a circular wall of particles and connecting springs.
@@ -71,7 +72,7 @@ def create_wall_rod(center: pygame.Vector2, radius: float = 100, segments: int =
     # create particles in a circle
     for i in range(segments):
         theta = (i / segments) * 2 * math.pi
-        pos = center + pygame.Vector2(math.cos(theta), math.sin(theta)) * radius
+        pos = center + Vec2(math.cos(theta), math.sin(theta)) * radius
         a = round(math.sin(i / segments * math.pi) * 255)
         p = Particle(position=pos, tag=tag, color=(a, 0, 255 - a))
         particles.append(p)
@@ -119,7 +120,7 @@ def create_wall_rod(center: pygame.Vector2, radius: float = 100, segments: int =
     return particles, springs
 
 
-def coccus(center: pygame.Vector2, radius: float = 100, segments: int = 20,
+def coccus(center: Vec2, radius: float = 100, segments: int = 20,
            tag: str = "wall", stiffness: float = 200, max_force: float = None, color=(255, 0, 0)):
     """
     Create a circular wall of particles and connecting springs.
@@ -130,7 +131,7 @@ def coccus(center: pygame.Vector2, radius: float = 100, segments: int = 20,
     # create particles in a circle
     for i in range(segments):
         theta = (i / segments) * 2 * math.pi
-        pos = center + pygame.Vector2(math.cos(theta), math.sin(theta)) * radius
+        pos = center + Vec2(math.cos(theta), math.sin(theta)) * radius
         a = round(math.sin(i / segments * math.pi) * 255)
         p = Particle(position=pos, tag=tag, color=(a, 0, 255 - a))
         particles.append(p)
@@ -153,7 +154,7 @@ def coccus(center: pygame.Vector2, radius: float = 100, segments: int = 20,
 
 
 # Capsule/rod shape: rectangle with semicircular ends
-def create_rod(center: pygame.Vector2, radius: float = 100, length: float = 200,
+def create_rod(center: Vec2, radius: float = 100, length: float = 200,
                segments: int = 100, tag: str = "rod", stiffness: float = 200,
                max_force: float = None, color=(255, 0, 0),
                include_cytoskeleton: bool = False, cyto_stiffness: float = None,
@@ -170,8 +171,8 @@ def create_rod(center: pygame.Vector2, radius: float = 100, length: float = 200,
     step = total_length / segments
     n_arc = int(round((math.pi * radius) / step))
     n_side = segments - 2 * n_arc
-    center_left = center + pygame.Vector2(-length / 2, 0)
-    center_right = center + pygame.Vector2(length / 2, 0)
+    center_left = center + Vec2(-length / 2, 0)
+    center_right = center + Vec2(length / 2, 0)
 
     # generate perimeter particles
     for i in range(segments):
@@ -179,17 +180,17 @@ def create_rod(center: pygame.Vector2, radius: float = 100, length: float = 200,
         if s < math.pi * radius:
             # left semicircle (top->bottom)
             theta = math.pi/2 + (s / (math.pi * radius)) * math.pi
-            pos = center_left + pygame.Vector2(math.cos(theta), math.sin(theta)) * radius
+            pos = center_left + Vec2(math.cos(theta), math.sin(theta)) * radius
         elif s < math.pi * radius + length:
             # bottom side
-            pos = pygame.Vector2(center_left.x + (s - math.pi * radius), center.y - radius)
+            pos = Vec2(center_left.x + (s - math.pi * radius), center.y - radius)
         elif s < 2 * math.pi * radius + length:
             # right semicircle (bottom->top)
             theta = 3*math.pi/2 + ((s - math.pi * radius - length) / (math.pi * radius)) * math.pi
-            pos = center_right + pygame.Vector2(math.cos(theta), math.sin(theta)) * radius
+            pos = center_right + Vec2(math.cos(theta), math.sin(theta)) * radius
         else:
             # top side
-            pos = pygame.Vector2(center_right.x - (s - 2*math.pi*radius - length), center.y + radius)
+            pos = Vec2(center_right.x - (s - 2*math.pi*radius - length), center.y + radius)
         p = Particle(position=pos, tag=tag, color=color)
         particles.append(p)
 
@@ -238,7 +239,7 @@ def create_rod(center: pygame.Vector2, radius: float = 100, length: float = 200,
         skeleton_particles = []
         for k in range(skeleton_count):
             t = k / (skeleton_count - 1) if skeleton_count > 1 else 0.5
-            pos = center_left + pygame.Vector2(length * t, 0)
+            pos = center_left + Vec2(length * t, 0)
             sp = Particle(position=pos, tag=tag + "_skel", color=color)
             particles.append(sp)
             skeleton_particles.append(sp)
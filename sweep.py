@@ -0,0 +1,138 @@
+# sweep.py
+"""
+Parameter sweeps over a process pool. Every point of the grid builds its own
+scene with a builder from structures.py, runs it headless and reports
+summary observables; the points are spread over all cores.
+
+    python sweep.py --builder create_wall --set radius=100 segments=100 \
+        --grid temperature=0,250,500 stiffness=1000,2000,3000 --steps 2000 --output sweep.csv
+"""
+import argparse
+import ast
+import csv
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import structures
+from vector import Vec2
+from headless import ENGINES, run_headless
+
+# grid parameters with these names go to the engine, all others to the builder
+ENGINE_PARAMS = ("gravity", "repulsion_radius", "repulsion_strength", "temperature", "damping_coeff", "neighbour_skin",
+                 "exclude_bonded", "exclude_same_tag", "solver", "xpbd_iterations",
+                 "adaptive_dt", "respa_substeps")
+
+
+def parameter_grid(grid: dict) -> list[dict]:
+    """All combinations of a {name: [values]} grid, as one dict per point."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def summarize(physics, dt) -> dict:
+    """Summary observables of the current state of an engine."""
+    physics.sync()
+    # the Verlet history spans the last step, which differs from dt with adaptive_dt
+    dt = physics.last_dt or dt
+    particles = physics.particles
+    n = len(particles)
+    xs = [p.pos.x for p in particles]
+    ys = [p.pos.y for p in particles]
+    exploded = not all(map(math.isfinite, xs + ys))
+    cx, cy = sum(xs) / n, sum(ys) / n
+    gyration = math.sqrt(sum((x - cx) ** 2 + (y - cy) ** 2 for x, y in zip(xs, ys)) / n)
+    kinetic = sum(0.5 * p.mass * ((p.pos - p.prev_pos) / dt).length_squared() for p in particles)
+    springs = [s for s in physics.springs if not s.broken]
+    strain = [abs((s.p2.pos - s.p1.pos).length() - s.rest_length) / s.rest_length
+              for s in springs if s.rest_length > 0]
+    return {
+        "exploded": exploded,
+        "radius_of_gyration": gyration,
+        "kinetic_energy": kinetic / n,
+        "mean_strain": sum(strain) / len(strain) if strain else 0.0,
+        "broken_springs": len(physics.springs) - len(springs),
+    }
+
+
+def run_point(task) -> dict:
+    """Build, run and summarize one grid point; runs in a worker process."""
+    builder, fixed, point, engine, steps, dt, seed = task
+    engine_kwargs = {k: v for k, v in point.items() if k in ENGINE_PARAMS}
+    builder_kwargs = dict(fixed)
+    builder_kwargs.update((k, v) for k, v in point.items() if k not in ENGINE_PARAMS)
+    builder_kwargs["center"] = Vec2(builder_kwargs.get("center", (0, 0)))
+
+    built = getattr(structures, builder)(**builder_kwargs)
+    particles, springs = built[0], built[1]
+    bending_springs = built[2] if len(built) > 2 else None
+
+    physics = ENGINES[engine](particles, springs, bending_springs, seed=seed, **engine_kwargs)
+    try:
+        timing = run_headless(physics, steps, dt)
+        summary = summarize(physics, dt)
+    finally:
+        if hasattr(physics, "close"):
+            physics.close()
+
+    result = dict(point)
+    result["steps_per_second"] = timing["steps_per_second"]
+    result["neighbour_rebuilds"] = timing["neighbour_rebuilds"]
+    result.update(summary)
+    return result
+
+
+def sweep(grid: dict, builder: str = "create_wall", builder_kwargs: dict = None, engine: str = "vectorized",
+          steps: int = 1000, dt: float = 1 / 120, processes: int = None, seed: int = 0) -> list[dict]:
+    """
+    Run every point of grid in a process pool and return one result dict per
+    point, in grid order. builder_kwargs are passed to the builder for every point.
+    """
+    points = parameter_grid(grid)
+    tasks = [(builder, builder_kwargs or {}, point, engine, steps, dt, seed + k)
+             for k, point in enumerate(points)]
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        return list(pool.map(run_point, tasks))
+
+
+def _parse_assignments(items) -> dict:
+    # "name=value" or "name=v1,v2,..." with python literals as values
+    parsed = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        parsed[name] = ast.literal_eval(value)
+    return parsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--builder", default="create_wall", help="scene builder from structures.py")
+    parser.add_argument("--set", nargs="*", default=[], metavar="NAME=VALUE",
+                        help="builder arguments shared by all points")
+    parser.add_argument("--grid", nargs="+", required=True, metavar="NAME=V1,V2,...",
+                        help="swept engine or builder parameters")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="vectorized")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--dt", type=float, default=1 / 120)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this CSV file")
+    args = parser.parse_args(argv)
+
+    grid = {name: list(values) if isinstance(values, tuple) else [values]
+            for name, values in _parse_assignments(args.grid).items()}
+    results = sweep(grid, args.builder, _parse_assignments(args.set), args.engine,
+                    args.steps, args.dt, args.processes, args.seed)
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+    for result in results:
+        print(", ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# vector.py
+import math
+
+
+def _vec(x, y):
+    # fast constructor for internal results, skips the argument parsing of __init__
+    v = _new(Vec2)
+    v.x = x
+    v.y = y
+    return v
+
+
+class Vec2:
+    """
+    Minimal 2D vector used by the physics core in place of pygame.Vector2, so
+    that the engine and the structure builders run without pygame.
+    Supports the subset of the pygame.Vector2 API the simulation uses and
+    behaves like a sequence of two floats, so it can be handed to
+    pygame.draw and friends directly. Operands may be any (x, y) sequence.
+    """
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0.0, y=None):
+        if y is None:
+            if isinstance(x, (int, float)):
+                # like pygame.Vector2(a): both components set to a
+                self.x = self.y = float(x)
+            else:
+                self.x, self.y = float(x[0]), float(x[1])
+        else:
+            self.x = float(x)
+            self.y = float(y)
+
+    # sequence protocol
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, i):
+        if i == 0 or i == -2:
+            return self.x
+        if i == 1 or i == -1:
+            return self.y
+        raise IndexError("Vec2 index out of range")
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __repr__(self):
+        return f"Vec2({self.x}, {self.y})"
+
+    def __eq__(self, other):
+        try:
+            return self.x == other[0] and self.y == other[1] and len(other) == 2
+        except (TypeError, IndexError):
+            return NotImplemented
+
+    __hash__ = None
+
+    # arithmetic
+    def __add__(self, other):
+        if other.__class__ is Vec2:
+            return _vec(self.x + other.x, self.y + other.y)
+        return _vec(self.x + other[0], self.y + other[1])
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if other.__class__ is Vec2:
+            return _vec(self.x - other.x, self.y - other.y)
+        return _vec(self.x - other[0], self.y - other[1])
+
+    def __rsub__(self, other):
+        return _vec(other[0] - self.x, other[1] - self.y)
+
+    def __mul__(self, k):
+        return _vec(self.x * k, self.y * k)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, k):
+        return _vec(self.x / k, self.y / k)
+
+    def __neg__(self):
+        return _vec(-self.x, -self.y)
+
+    # in place, like pygame.Vector2 these mutate the vector itself
+    def __iadd__(self, other):
+        if other.__class__ is Vec2:
+            self.x += other.x
+            self.y += other.y
+        else:
+            self.x += other[0]
+            self.y += other[1]
+        return self
+
+    def __isub__(self, other):
+        if other.__class__ is Vec2:
+            self.x -= other.x
+            self.y -= other.y
+        else:
+            self.x -= other[0]
+            self.y -= other[1]
+        return self
+
+    def __imul__(self, k):
+        self.x *= k
+        self.y *= k
+        return self
+
+    def __itruediv__(self, k):
+        self.x /= k
+        self.y /= k
+        return self
+
+    def copy(self):
+        return _vec(self.x, self.y)
+
+    def update(self, x=0.0, y=None):
+        if y is None:
+            x, y = x
+        self.x = float(x)
+        self.y = float(y)
+
+    def dot(self, other):
+        if other.__class__ is Vec2:
+            return self.x * other.x + self.y * other.y
+        return self.x * other[0] + self.y * other[1]
+
+    def length(self):
+        return math.hypot(self.x, self.y)
+
+    def length_squared(self):
+        return self.x * self.x + self.y * self.y
+
+    def normalize(self):
+        length = math.hypot(self.x, self.y)
+        if length == 0:
+            raise ValueError("Can't normalize Vector of length Zero")
+        return _vec(self.x / length, self.y / length)
+
+
+_new = object.__new__
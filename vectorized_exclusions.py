@@ -0,0 +1,48 @@
+# vectorized_exclusions.py
+import numpy as np
+from exclusions import Exclusions, bonded_pairs
+from spring import Spring
+
+
+class ArrayExclusions(Exclusions):
+    """
+    Exclusions of VectorizedPhysicsEngine: the bonded pairs as a sorted array
+    of pair keys i * N + j (i < j) and the tags as integer codes, so a whole
+    array of candidate pairs is checked with one searchsorted.
+    """
+    def __init__(self, bonded: int = 0, same_tag: bool = False):
+        super().__init__(bonded, same_tag)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.tags = None
+
+    def update(self, particles, spring_set, bending_set):
+        n = len(particles)
+        # the sets flag springs that break on their Spring objects too, which bumps Spring.broken_changes
+        key = (id(particles), n, id(spring_set), len(spring_set), id(bending_set), len(bending_set),
+               Spring.broken_changes, self.bonded, self.same_tag)
+        if key == self._key:
+            return
+        self._key = key
+        self.version += 1
+        intact = ~spring_set.broken
+        pairs = bonded_pairs(zip(spring_set.p1[intact].tolist(), spring_set.p2[intact].tolist()),
+                             zip(bending_set.p1.tolist(), bending_set.p2.tolist(), bending_set.p3.tolist()),
+                             self.bonded)
+        self.keys = np.sort(np.fromiter((a * n + b for a, b in pairs), dtype=np.int64, count=len(pairs)))
+        self.n = n
+        if self.same_tag:
+            codes = {}
+            # -1 for particles without a tag
+            self.tags = np.array([-1 if p.tag is None else codes.setdefault(p.tag, len(codes)) for p in particles],
+                                 dtype=np.int64)
+
+    def mask(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """True for the pairs (i[k], j[k]) that are excluded."""
+        excluded = np.zeros(len(i), dtype=bool)
+        if len(self.keys):
+            k = np.minimum(i, j) * self.n + np.maximum(i, j)
+            idx = np.minimum(np.searchsorted(self.keys, k), len(self.keys) - 1)
+            excluded = self.keys[idx] == k
+        if self.same_tag:
+            excluded |= (self.tags[i] == self.tags[j]) & (self.tags[i] >= 0)
+        return excluded
@@ -0,0 +1,73 @@
+# vectorized_noise.py
+import numpy as np
+from noise import BrownianNoise, GOLDEN, MASK64, step_key, random_seed
+
+_GOLDEN = np.uint64(GOLDEN)
+_GOLDEN2 = np.uint64((2 * GOLDEN) & MASK64)
+
+
+def mix64(z: np.ndarray) -> np.ndarray:
+    """noise.mix64 on a uint64 array, the multiplications wrap like the masked ones there."""
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def counter_normals(key: int, ids: np.ndarray) -> np.ndarray:
+    """(len(ids), 2) standard normals, row k equal to noise.counter_normals(key, ids[k]) up to rounding."""
+    h = mix64(np.uint64(key) ^ (ids.astype(np.uint64) * _GOLDEN))
+    u1 = ((mix64(h + _GOLDEN) >> np.uint64(11)) + np.uint64(1)) * 2.0 ** -53
+    u2 = (mix64(h + _GOLDEN2) >> np.uint64(11)) * 2.0 ** -53
+    r = np.sqrt(-2.0 * np.log(u1))
+    theta = 2.0 * np.pi * u2
+    return np.column_stack((r * np.cos(theta), r * np.sin(theta)))
+
+
+class ArrayBrownianNoise(BrownianNoise):
+    """
+    Noise source of VectorizedPhysicsEngine: all normals of a step are drawn
+    in one batch, from a numpy Generator or the counter based stream.
+    """
+    def __init__(self, seed: int = None, counter_based: bool = False):
+        super().__init__(random_seed() if seed is None else seed, counter_based)
+        self.rng = np.random.default_rng(self.seed)
+        self._mass = None
+        self._scale = None
+
+    def accel_scale(self, mass: np.ndarray, temperature, damping_coeff, dt) -> np.ndarray:
+        """
+        sigma / m for every particle, the standard deviation of the Brownian
+        acceleration. Computed once per mass class and kept until temperature,
+        damping_coeff, dt or the mass array change.
+        """
+        key = (temperature, damping_coeff, dt)
+        if self._scale is None or self._sigmas.key != key or self._mass is not mass or len(self._scale) != len(mass):
+            self._sigmas = self.sigmas(temperature, damping_coeff, dt)
+            classes, inverse = np.unique(mass, return_inverse=True)
+            scale = np.array([self._sigmas[m] / m for m in classes.tolist()], dtype=float)
+            self._scale = scale[inverse]
+            self._mass = mass
+        return self._scale
+
+    def invalidate(self):
+        """Forget the cached scales, call after changing the mass array in place."""
+        self._scale = None
+
+    def normals(self, ids: np.ndarray) -> np.ndarray:
+        """(len(ids), 2) standard normals for the particles at rows ids."""
+        if self.counter_based:
+            return counter_normals(self._key, ids)
+        return self.rng.standard_normal((len(ids), 2))
+
+    def get_state(self) -> dict:
+        return {"seed": self.seed, "step": self.step, "counter_based": self.counter_based,
+                "numpy": self.rng.bit_generator.state}
+
+    def set_state(self, state: dict):
+        self.seed = state["seed"]
+        self.counter_based = state["counter_based"]
+        self.step = state["step"]
+        self._key = step_key(self.seed, self.step)
+        self.rng = np.random.default_rng(self.seed)
+        if "numpy" in state:
+            self.rng.bit_generator.state = state["numpy"]
@@ -0,0 +1,278 @@
+# vectorized_physics.py
+import math
+import numpy as np
+from particle import Particle
+from spring import Spring
+from bending_spring import BendingSpring
+from physics import PhysicsEngine
+from array_utils import scatter_add
+from spring_set import SpringSet
+from bending_set import BendingSet
+from cell_list import grid_pairs, ArrayNeighbourList
+from vectorized_noise import ArrayBrownianNoise
+from vectorized_exclusions import ArrayExclusions
+from vectorized_spatial_index import ArraySpatialIndex
+from vectorized_xpbd import ArrayXPBD
+
+
+class VectorizedPhysicsEngine(PhysicsEngine):
+    """
+    Drop-in replacement for PhysicsEngine that keeps the particle state in
+    contiguous NumPy arrays (structure of arrays) and runs every phase of a step
+    as whole-array operations.
+
+    The Particle objects remain the public view of the state: positions are
+    written back to them after every step (see sync_every_step), and fixed
+    particles (e.g. the one being dragged with the mouse) are read from them
+    before every step; the fixed flags only when some Particle.fixed changed.
+    Particles and springs appended to the lists are picked up automatically;
+    call springs_changed() after editing Spring objects and rebuild() after
+    changing anything else on the objects (mass, ...).
+    """
+    noise_class = ArrayBrownianNoise
+    neighbour_list_class = ArrayNeighbourList
+    exclusions_class = ArrayExclusions
+    spatial_index_class = ArraySpatialIndex
+    # write the positions back to the Particle objects at the end of every
+    # step; without it they are only written by sync()
+    sync_every_step = True
+
+    def __init__(self, particles: list[Particle], springs: list[Spring], bending_springs: list[BendingSpring]=None, gravity=(0, 0), repulsion_radius=20,
+                 repulsion_strength=100, temperature=1.0, damping_coeff=1.0, seed=None, boundary=None,
+                 neighbour_skin=0, exclude_bonded=0, exclude_same_tag=False, solver="force", xpbd_iterations=8,
+                 adaptive_dt=None, respa_substeps=1):
+        super().__init__(particles, springs, bending_springs, gravity=gravity, repulsion_radius=repulsion_radius,
+                         repulsion_strength=repulsion_strength, temperature=temperature, damping_coeff=damping_coeff,
+                         seed=seed, boundary=boundary, neighbour_skin=neighbour_skin, exclude_bonded=exclude_bonded,
+                         exclude_same_tag=exclude_same_tag, solver=solver, xpbd_iterations=xpbd_iterations,
+                         adaptive_dt=adaptive_dt, respa_substeps=respa_substeps)
+        self.xpbd = ArrayXPBD()
+        self._pair_tests = 0
+        self._synced = True
+        self.rebuild()
+
+    def rebuild(self):
+        """(Re)read the complete particle state from the Particle objects."""
+        self.sync()
+        ps = self.particles
+        n = len(ps)
+        self.pos = np.array([(p.pos.x, p.pos.y) for p in ps], dtype=float).reshape(n, 2)
+        self.prev_pos = np.array([(p.prev_pos.x, p.prev_pos.y) for p in ps], dtype=float).reshape(n, 2)
+        self.acc = np.array([(p.acc.x, p.acc.y) for p in ps], dtype=float).reshape(n, 2)
+        self.mass = np.array([p.mass for p in ps], dtype=float)
+        self.fixed = np.array([p.fixed for p in ps], dtype=bool)
+        self._fixed_changes = Particle.fixed_changes
+        self._fixed_index = np.flatnonzero(self.fixed)
+        for p in ps:
+            p.acc.update(0, 0)
+        self._update_inv_mass()
+        self.index = {id(p): i for i, p in enumerate(ps)}
+        self.spring_set = SpringSet(self.springs, self.index)
+        self.bending_set = BendingSet(self.bending_springs, self.index)
+
+    def springs_changed(self):
+        self.spring_set.refresh()
+        self.bending_set.refresh()
+
+    def _update_inv_mass(self):
+        # fixed particles do not accelerate, zeroing 1/m masks them out of every force
+        self.inv_mass = np.where(self.fixed, 0.0, 1.0 / self.mass)
+
+    def begin_step(self):
+        # pick up what changed on the objects since the last step
+        ps = self.particles
+        if len(ps) != len(self.pos):
+            self.rebuild()
+            return
+        if len(self.springs) != len(self.spring_set):
+            self.spring_set = SpringSet(self.springs, self.index)
+        if len(self.bending_springs or []) != len(self.bending_set):
+            self.bending_set = BendingSet(self.bending_springs, self.index)
+        if self._fixed_changes != Particle.fixed_changes:
+            self._fixed_changes = Particle.fixed_changes
+            self.fixed[:] = np.fromiter((p.fixed for p in ps), dtype=bool, count=len(ps))
+            self._fixed_index = np.flatnonzero(self.fixed)
+            self._update_inv_mass()
+        # fixed particles are driven from outside, take their positions as they are
+        for i in self._fixed_index.tolist():
+            p = ps[i]
+            self.pos[i] = p.pos.x, p.pos.y
+            self.prev_pos[i] = p.prev_pos.x, p.prev_pos.y
+
+    def end_step(self):
+        self._synced = False
+        if self.sync_every_step:
+            self.sync()
+
+    def sync(self):
+        # write the new state back to the objects for rendering and UI
+        if self._synced:
+            return
+        for p, (x, y), (px, py) in zip(self.particles, self.pos.tolist(), self.prev_pos.tolist()):
+            p.pos.update(x, y)
+            p.prev_pos.update(px, py)
+        self._synced = True
+
+    def positions(self):
+        return self.pos
+
+    def _spatial_index(self):
+        # particles added since the last step are not in self.pos yet
+        cell_size = self.repulsion_radius if self.repulsion_radius > 0 else 20
+        self.spatial_index.update(self.pos, (self.steps, len(self.pos)), cell_size)
+        return self.spatial_index
+
+    def nearest(self, x, y, max_dist=math.inf):
+        i = self._spatial_index().nearest(x, y, max_dist)
+        return self.particles[i] if i >= 0 else None
+
+    def within_radius(self, x, y, r) -> list:
+        ps = self.particles
+        return [ps[i] for i in self._spatial_index().within_radius(x, y, r).tolist()]
+
+    def within_box(self, x0, y0, x1, y1) -> list:
+        ps = self.particles
+        return [ps[i] for i in self._spatial_index().within_box(x0, y0, x1, y1).tolist()]
+
+    def broken_flags(self):
+        return self.spring_set.broken
+
+    def count_broken_springs(self) -> int:
+        return int(np.count_nonzero(self.spring_set.broken))
+
+    def count_pair_tests(self) -> int:
+        return self._pair_tests
+
+    def apply_force(self, force: np.ndarray):
+        """Accumulate an (N, 2) array of forces."""
+        self.acc += force * self.inv_mass[:, None]
+
+    def apply_gravity(self):
+        self.acc[~self.fixed] += (self.gravity.x, self.gravity.y)
+
+    def apply_springs(self):
+        if not self.springs or self.solver == "xpbd":
+            return
+        f = np.zeros_like(self.pos)
+        self.spring_set.apply(self.pos, f, self._wrap())
+        self.apply_force(f)
+
+    def apply_bending(self):
+        if not self.bending_springs or self.solver == "xpbd":
+            return
+        f = np.zeros_like(self.pos)
+        self.bending_set.apply(self.pos, f, self._wrap())
+        self.apply_force(f)
+
+    def _repulsion_pairs(self):
+        # candidate pairs (i, j) of the repulsion without the excluded ones
+        r = self.repulsion_radius
+        excl = self._exclusions()
+        if self.neighbour_skin > 0:
+            i, j = self.neighbours.update(self.pos, r, self.neighbour_skin, self.boundary, excl)
+        else:
+            i, j = grid_pairs(self.pos, r, self.boundary.size if self.boundary.periodic else None)
+        self._pair_tests = len(i)
+        if excl is not None and self.neighbour_skin <= 0:
+            keep = ~excl.mask(i, j)
+            i, j = i[keep], j[keep]
+        return i, j
+
+    def apply_repulsion(self):
+        r = self.repulsion_radius
+        self._pair_tests = 0
+        if r <= 0 or len(self.pos) < 2:
+            return
+        i, j = self._repulsion_pairs()
+        delta = self.pos[j] - self.pos[i]
+        if self.boundary.periodic:
+            delta = self.boundary.wrap(delta)
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        hit = (dist > 0) & (dist < r)
+        i, j, delta, dist = i[hit], j[hit], delta[hit], dist[hit]
+        force = delta * (self.repulsion_strength * (r - dist) / (r * dist))[:, None]
+        f = np.zeros_like(self.pos)
+        scatter_add(f, j, force)
+        scatter_add(f, i, -force)
+        self.apply_force(f)
+
+    def apply_drag(self, dt):
+        free = np.flatnonzero(~self.fixed)
+        # viscous drag: F_drag = -γ·m·v, i.e. a = -γ·v
+        vel = (self.pos[free] - self.prev_pos[free]) / dt
+        self.acc[free] -= self.damping_coeff * vel
+        # Brownian force: Gaussian noise, variance 2·γ·T·m / dt (with k_B = 1), as acceleration
+        scale = self.noise.accel_scale(self.mass, self.temperature, self.damping_coeff, dt)[free]
+        self.acc[free] += self.noise.normals(free) * scale[:, None]
+        self.noise.advance()
+
+    def _exclusions(self):
+        if not self.exclusions.active:
+            return None
+        self.exclusions.update(self.particles, self.spring_set, self.bending_set)
+        return self.exclusions
+
+    def _wrap(self):
+        return self.boundary.wrap if self.boundary.periodic else None
+
+    def stable_dt(self, safety: float = 0.5) -> float:
+        bonded_omega2 = omega2 = 0.0
+        inv_mass = self.inv_mass
+        if self.solver == "force":
+            ss = self.spring_set
+            if len(ss):
+                k = np.where(ss.broken, 0.0, 0.5 * ss.stiffness)
+                bonded_omega2 = max(bonded_omega2, float(np.max(k * (inv_mass[ss.p1] + inv_mass[ss.p2]))))
+            bs = self.bending_set
+            if len(bs):
+                _, _, _, l1, l2 = bs.angles(self.pos, self._wrap())
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    w = (inv_mass[bs.p1] / l1 + inv_mass[bs.p3] / l2 + inv_mass[bs.p2] * (1 / l1 + 1 / l2))
+                w = np.where((l1 > 0) & (l2 > 0), w, 0.0)
+                bonded_omega2 = max(bonded_omega2, float(np.max(bs.stiffness * w)))
+        if self.repulsion_radius > 0 and len(inv_mass):
+            omega2 = max(omega2, 2 * self.repulsion_strength / self.repulsion_radius * float(inv_mass.max()))
+        dt = math.inf
+        if bonded_omega2 > 0:
+            dt = safety * 2 / math.sqrt(bonded_omega2) * self.respa_substeps
+        if omega2 > 0:
+            dt = min(dt, safety * 2 / math.sqrt(omega2))
+        if self.damping_coeff > 0:
+            dt = min(dt, safety * 2 / self.damping_coeff)
+        if self.last_dt and self.repulsion_radius > 0 and len(self.pos):
+            free = ~self.fixed
+            d = self.pos[free] - self.prev_pos[free]
+            speed = math.sqrt(float(np.max(d[:, 0] ** 2 + d[:, 1] ** 2, initial=0.0))) / self.last_dt
+            if speed > 0:
+                dt = min(dt, 0.1 * self.repulsion_radius / speed)
+        return dt
+
+    def _acc_copy(self):
+        return self.acc.copy()
+
+    def _add_acc(self, acc):
+        self.acc += acc
+
+    def rescale_history(self, ratio: float):
+        free = ~self.fixed
+        self.prev_pos[free] = self.pos[free] - (self.pos[free] - self.prev_pos[free]) * ratio
+
+    def solve_constraints(self, dt):
+        if self.solver != "xpbd":
+            return
+        wrap = self._wrap()
+        self.xpbd.break_springs(self.spring_set, self.pos, wrap)
+        self.xpbd.update(self.spring_set, self.bending_set)
+        self.xpbd.solve(self.pos, self.inv_mass, self.spring_set, self.bending_set, dt, self.xpbd_iterations, wrap)
+
+    def apply_boundary(self):
+        self.boundary.apply_arrays(self.pos, self.prev_pos)
+
+    def integrate(self, dt, damping=0.98):
+        # Verlet integration of all free particles at once
+        free = ~self.fixed
+        pos = self.pos[free]
+        velocity = (pos - self.prev_pos[free]) * damping
+        self.prev_pos[free] = pos
+        self.pos[free] = pos + velocity + self.acc[free] * dt * dt
+        self.acc[:] = 0
@@ -0,0 +1,102 @@
+# vectorized_spatial_index.py
+import math
+import numpy as np
+from cell_list import expand_ranges
+
+
+class ArraySpatialIndex:
+    """
+    spatial_index.SpatialIndex for an (N, 2) position array: the point
+    indices sorted by cell key, so the points of a row of cells are one
+    contiguous range found with searchsorted. Queries return point indices.
+    """
+    def __init__(self, cell_size: float = 20):
+        self.cell_size = cell_size
+        self.pos = np.empty((0, 2))
+        self.keys = self.order = np.empty(0, dtype=np.int64)
+        # first occupied cell and the number of cells along x and y, None if there are none
+        self.origin = self.shape = None
+        self._key = None
+
+    def invalidate(self):
+        self._key = None
+
+    def update(self, pos: np.ndarray, key, cell_size: float = None):
+        if cell_size is not None and cell_size != self.cell_size:
+            self.cell_size = cell_size
+            self._key = None
+        if key == self._key:
+            return
+        self._key = key
+        self.pos = pos
+        valid = np.flatnonzero(np.isfinite(pos).all(axis=1))
+        if len(valid) == 0:
+            self.origin = self.shape = None
+            return
+        cells = np.floor(pos[valid] / self.cell_size).astype(np.int64)
+        origin = cells.min(axis=0)
+        cells -= origin
+        shape = cells.max(axis=0) + 1
+        keys = cells[:, 0] * shape[1] + cells[:, 1]
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.order = valid[order]
+        self.origin = (int(origin[0]), int(origin[1]))
+        self.shape = (int(shape[0]), int(shape[1]))
+
+    def _cells(self, cx0, cy0, cx1, cy1) -> np.ndarray:
+        # indices of the points in the given (inclusive) range of cells
+        if self.shape is None:
+            return np.empty(0, dtype=np.int64)
+        (ox, oy), (nx, ny) = self.origin, self.shape
+        cx0, cx1 = max(cx0 - ox, 0), min(cx1 - ox, nx - 1)
+        cy0, cy1 = max(cy0 - oy, 0), min(cy1 - oy, ny - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(cx0, cx1 + 1) * ny
+        lo = np.searchsorted(self.keys, rows + cy0)
+        hi = np.searchsorted(self.keys, rows + cy1, side="right")
+        _, idx = expand_ranges(lo, hi)
+        return self.order[idx]
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def within_box(self, x0, y0, x1, y1) -> np.ndarray:
+        idx = self._cells(*self._cell(x0, y0), *self._cell(x1, y1))
+        p = self.pos[idx]
+        return idx[(p[:, 0] >= x0) & (p[:, 0] <= x1) & (p[:, 1] >= y0) & (p[:, 1] <= y1)]
+
+    def within_radius(self, x, y, r) -> np.ndarray:
+        idx = self._cells(*self._cell(x - r, y - r), *self._cell(x + r, y + r))
+        d = self.pos[idx] - (x, y)
+        return idx[d[:, 0] ** 2 + d[:, 1] ** 2 <= r * r]
+
+    def nearest(self, x, y, max_dist=math.inf) -> int:
+        """Index of the point closest to (x, y), -1 if there is none within max_dist."""
+        if self.shape is None:
+            return -1
+        size = self.cell_size
+        cx, cy = self._cell(x, y)
+        (ox, oy), (nx, ny) = self.origin, self.shape
+        last = max(cx - ox, ox + nx - 1 - cx, cy - oy, oy + ny - 1 - cy)
+        best = -1
+        best_d2 = max_dist * max_dist
+        k = 0
+        # same ring search as SpatialIndex.nearest
+        while k <= last and (max(k - 1, 0) * size) ** 2 < best_d2:
+            if k == 0:
+                idx = self._cells(cx, cy, cx, cy)
+            else:
+                idx = np.concatenate((self._cells(cx - k, cy - k, cx + k, cy - k),
+                                      self._cells(cx - k, cy + k, cx + k, cy + k),
+                                      self._cells(cx - k, cy - k + 1, cx - k, cy + k - 1),
+                                      self._cells(cx + k, cy - k + 1, cx + k, cy + k - 1)))
+            if len(idx):
+                d = self.pos[idx] - (x, y)
+                d2 = d[:, 0] ** 2 + d[:, 1] ** 2
+                m = int(np.argmin(d2))
+                if d2[m] < best_d2:
+                    best, best_d2 = int(idx[m]), float(d2[m])
+            k += 1
+        return best
@@ -0,0 +1,110 @@
+# vectorized_xpbd.py
+import numpy as np
+from xpbd import color_constraints
+
+
+def color_batches(members) -> list:
+    """Index arrays of the constraints of each colour, see xpbd.color_constraints."""
+    colors = np.array(color_constraints(members), dtype=np.int64)
+    if len(colors) == 0:
+        return []
+    order = np.argsort(colors, kind="stable")
+    ends = np.cumsum(np.bincount(colors))
+    return np.split(order, ends[:-1])
+
+
+class ArrayXPBD:
+    """
+    xpbd.py for VectorizedPhysicsEngine. The springs and bending springs are
+    coloured once per SpringSet/BendingSet so that no particle appears twice
+    within a colour; each colour is then one batch of array operations, and
+    sweeping over the colours in turn is a Gauss-Seidel iteration.
+    """
+    def __init__(self):
+        self._spring_set = self._bending_set = None
+        self.spring_batches = self.bending_batches = []
+
+    def update(self, spring_set, bending_set):
+        if spring_set is not self._spring_set:
+            self._spring_set = spring_set
+            self.spring_batches = color_batches(zip(spring_set.p1.tolist(), spring_set.p2.tolist()))
+        if bending_set is not self._bending_set:
+            self._bending_set = bending_set
+            self.bending_batches = color_batches(zip(bending_set.p1.tolist(), bending_set.p2.tolist(),
+                                                     bending_set.p3.tolist()))
+
+    @staticmethod
+    def break_springs(ss, pos, wrap=None) -> int:
+        """xpbd.break_springs on a SpringSet."""
+        if len(ss) == 0:
+            return 0
+        delta = pos[ss.p2] - pos[ss.p1]
+        if wrap is not None:
+            delta = wrap(delta)
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        snapped = ~ss.broken & (dist != 0) & (0.5 * ss.stiffness * np.abs(dist - ss.rest_length) > ss.max_force)
+        snapped = np.flatnonzero(snapped)
+        ss.broken[snapped] = True
+        if ss.springs is not None:
+            for k in snapped.tolist():
+                ss.springs[k].broken = True
+        return len(snapped)
+
+    def solve(self, pos, inv_mass, ss, bs, dt: float, iterations: int, wrap=None):
+        """iterations Gauss-Seidel sweeps over all constraints, moving pos in place."""
+        spring_lambda = np.zeros(len(ss))
+        bending_lambda = np.zeros(len(bs))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            spring_alpha = np.where(ss.stiffness > 0, 2 / (ss.stiffness * dt * dt), np.inf)
+        for _ in range(iterations):
+            for idx in self.spring_batches:
+                self._springs(pos, inv_mass, ss, idx, spring_alpha[idx], spring_lambda, wrap)
+            for idx in self.bending_batches:
+                self._bending(pos, inv_mass, bs, idx, dt, bending_lambda, wrap)
+
+    @staticmethod
+    def _springs(pos, inv_mass, ss, idx, alpha, lam, wrap):
+        a, b = ss.p1[idx], ss.p2[idx]
+        delta = pos[b] - pos[a]
+        if wrap is not None:
+            delta = wrap(delta)
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        w1, w2 = inv_mass[a], inv_mass[b]
+        active = ~ss.broken[idx] & np.isfinite(alpha) & (dist != 0) & (w1 + w2 > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dl = np.where(active, (ss.rest_length[idx] - dist - alpha * lam[idx]) / (w1 + w2 + alpha), 0.0)
+            n = np.where(active[:, None], delta / dist[:, None], 0.0) * dl[:, None]
+        lam[idx] += dl
+        pos[a] -= n * w1[:, None]
+        pos[b] += n * w2[:, None]
+
+    @staticmethod
+    def _bending(pos, inv_mass, bs, idx, dt, lam, wrap):
+        a, v, c = bs.p1[idx], bs.p2[idx], bs.p3[idx]
+        e1 = pos[a] - pos[v]
+        e2 = pos[c] - pos[v]
+        if wrap is not None:
+            e1, e2 = wrap(e1), wrap(e2)
+        l1 = e1[:, 0] ** 2 + e1[:, 1] ** 2
+        l2 = e2[:, 0] ** 2 + e2[:, 1] ** 2
+        angle = np.arctan2(e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0], e1[:, 0] * e2[:, 0] + e1[:, 1] * e2[:, 1])
+        # unsigned triples come first in a BendingSet
+        signed = idx >= bs.n_unsigned
+        rest = bs.rest_angle[idx]
+        constraint = np.where(signed, (angle - rest + np.pi) % (2 * np.pi) - np.pi, np.abs(angle) - rest)
+        sign = np.where(signed | (angle >= 0), 1.0, -1.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            g1 = np.column_stack((e1[:, 1], -e1[:, 0])) * (sign / l1)[:, None]
+            g3 = np.column_stack((-e2[:, 1], e2[:, 0])) * (sign / l2)[:, None]
+            g2 = -(g1 + g3)
+            wa, wv, wc = inv_mass[a], inv_mass[v], inv_mass[c]
+            w = (wa * (g1 ** 2).sum(axis=1) + wv * (g2 ** 2).sum(axis=1) + wc * (g3 ** 2).sum(axis=1))
+            stiffness = bs.stiffness[idx]
+            alpha = 2 / (stiffness * (np.sqrt(l1) + np.sqrt(l2)) * dt * dt)
+            active = (stiffness > 0) & (l1 > 0) & (l2 > 0) & (w > 0)
+            dl = np.where(active, (-constraint - alpha * lam[idx]) / (w + alpha), 0.0)
+        lam[idx] += dl
+        dl = dl[:, None]
+        pos[a] += np.where(dl != 0, g1 * dl * wa[:, None], 0.0)
+        pos[v] += np.where(dl != 0, g2 * dl * wv[:, None], 0.0)
+        pos[c] += np.where(dl != 0, g3 * dl * wc[:, None], 0.0)